@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+記事生成エンジンのベンチマーク
+Usage: python bench.py [--sizes 10,1000,10000] [--jobs N] [--output bench.json]
+
+Builds synthetic plans_data.json catalogues of each size, times every page
+generator in-process, then runs the full generate.py pipeline on a scratch
+copy of the site and prints the results as JSON. The pipeline's
+peak_rss_kb is the main process only; with --jobs N, worker_peak_rss_kb
+is the largest single worker, so the pool's total is up to N times that.
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import generate
+
+BASE_DIR = Path(__file__).parent
+
+
+# --- Synthetic Catalogue ---
+def make_catalogue(n_plans, seed=0):
+    """Build a plans_data.json-shaped dict with ``n_plans`` plans.
+
+    Plans are cloned from the raw real catalogue (not the loaded one, whose
+    plans carry derived fields) with varied prices and data sizes;
+    compare_pairs (about 2 per plan) and ranking_articles (one per 20
+    plans, at least 6) grow proportionally.
+    """
+    rng = random.Random(seed)
+    with open(generate.DATA_FILE, 'r', encoding='utf-8') as f:
+        templates = json.load(f)['sim_plans']
+    plans = []
+    for i in range(n_plans):
+        plan = dict(templates[i % len(templates)])
+        plan['id'] = f"plan{i:05d}"
+        plan['carrier'] = f"{plan['carrier']} {i}"
+        plan['monthly_price'] = rng.randrange(0, 5000, 10)
+        plan['data_gb'] = rng.choice([0, 1, 3, 5, 10, 20, 30])
+        plan['data_gb_large'] = rng.choice([-1, 20, 50, 100])
+        plan['large_plan_price'] = rng.choice([-1, 0, rng.randrange(1000, 8000, 10)])
+        plans.append(plan)
+
+    ids = [p['id'] for p in plans]
+    pairs = set()
+    if n_plans > 1:
+        target = min(2 * n_plans, n_plans * (n_plans - 1) // 2)
+        while len(pairs) < target:
+            a, b = rng.sample(ids, 2)
+            if (b, a) not in pairs:
+                pairs.add((a, b))
+
+    rankings = []
+    for i in range(max(6, n_plans // 20)):
+        rankings.append({
+            'id': f"bench{i}",
+            'title': f"ベンチマーク ランキング {i}",
+            'description': "ベンチマーク用の合成ランキングです。",
+            'ranking_order': rng.sample(ids, min(11, n_plans)),
+            'target_keyword': "格安SIM",
+        })
+
+    return {
+        'sim_plans': plans,
+        'compare_pairs': [list(pair) for pair in sorted(pairs)],
+        'ranking_articles': rankings,
+    }
+
+
+def peak_rss_kb(who=resource.RUSAGE_SELF):
+    return resource.getrusage(who).ru_maxrss
+
+
+# --- Generator Benchmarks ---
+def bench_generators(data):
+    """Render every page in-process and time each page kind separately."""
+    # Loaded the way load_data() does, on a copy: the dict is dumped for the pipeline run later
+    data = copy.deepcopy(data)
+    generate.validate_catalogue(data)
+    data = generate.Catalogue(generate.normalize_catalogue(data))
+    ctx = generate.BuildContext()
+    stats = {}
+    for page in generate.enumerate_pages(data):
+        t0 = time.perf_counter()
+        size = len(generate.render_page(page, data, ctx).encode('utf-8'))
+        elapsed = time.perf_counter() - t0
+        s = stats.setdefault(page['kind'], {'pages': 0, 'seconds': 0.0, 'bytes': 0})
+        s['pages'] += 1
+        s['seconds'] += elapsed
+        s['bytes'] += size
+    for s in stats.values():
+        s['pages_per_sec'] = round(s['pages'] / s['seconds'], 1) if s['seconds'] else None
+        s['seconds'] = round(s['seconds'], 4)
+    return stats
+
+
+# --- Full Pipeline ---
+def bench_pipeline(data, jobs):
+    """Run generate.py end to end on a scratch site in a fresh interpreter."""
+    with tempfile.TemporaryDirectory(prefix="simlab-bench-") as tmp:
+        site = Path(tmp)
+        shutil.copy2(BASE_DIR / "generate.py", site / "generate.py")
+        shutil.copytree(generate.STATIC_DIR, site / "static")
+        (site / "data").mkdir()
+        with open(site / "data" / "plans_data.json", 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+        result = subprocess.run(
+            [sys.executable, str(Path(__file__).resolve()), '--pipeline', str(site), '--jobs', str(jobs)],
+            check=True, capture_output=True, text=True,
+        )
+        stats = json.loads(result.stdout)
+        stats['output_bytes'] = sum(p.stat().st_size for p in (site / "output").rglob("*.html"))
+        stats['output_bytes'] += (site / "index.html").stat().st_size
+        stats['pages_per_sec'] = round(stats['pages'] / stats['seconds'], 1)
+        return stats
+
+
+def run_pipeline_child(site, jobs):
+    """Entry point of the child interpreter started by bench_pipeline()."""
+    sys.path.insert(0, str(site))
+    sys.modules.pop('generate', None)
+    import generate as site_generate
+
+    data = site_generate.load_data()
+    pages = len(site_generate.enumerate_pages(data))
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Precompression is a deploy step, not part of the page pipeline being measured
+        site_generate.main(['--force', '--no-compress', '--jobs', str(jobs)])
+    elapsed = time.perf_counter() - t0
+    # ru_maxrss of the children is the largest single worker, not the sum over the pool
+    json.dump({'pages': pages, 'seconds': round(elapsed, 4), 'peak_rss_kb': peak_rss_kb(),
+               'worker_peak_rss_kb': peak_rss_kb(resource.RUSAGE_CHILDREN)}, sys.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="記事生成エンジンのベンチマーク")
+    parser.add_argument('--sizes', default="10,1000,10000",
+                        help="comma-separated catalogue sizes (number of plans)")
+    parser.add_argument('--jobs', '-j', type=int, default=1, help="--jobs passed to generate.py")
+    parser.add_argument('--output', '-o', type=Path, help="also write the JSON report to this file")
+    parser.add_argument('--pipeline', type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.pipeline:
+        run_pipeline_child(args.pipeline, args.jobs)
+        return
+
+    report = {'python': sys.version.split()[0], 'jobs': args.jobs, 'sizes': []}
+    for n in (int(x) for x in args.sizes.split(',')):
+        print(f"⏱️  {n:,}プランで計測中...", file=sys.stderr)
+        data = make_catalogue(n)
+        t0 = time.perf_counter()
+        generators = bench_generators(data)
+        report['sizes'].append({
+            'plans': n,
+            'compare_pairs': len(data['compare_pairs']),
+            'ranking_articles': len(data['ranking_articles']),
+            'generators': generators,
+            'generators_seconds': round(time.perf_counter() - t0, 4),
+            'generators_peak_rss_kb': peak_rss_kb(),
+            'pipeline': bench_pipeline(data, args.jobs),
+        })
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,728 @@
 #!/usr/bin/env python3
 """
 格安SIM・ネット回線 自動記事生成エンジン
-Usage: python generate.py
+Usage: python generate.py [--force] [--jobs N] [--all-pairs [all|price-band|parent]]
+                          [--changed ahamo,povo | --diff old_plans_data.json | --only review:*,...]
+                          [--site-url URL] [--minify] [--no-compress] [--stats] [--profile KIND]
+                          [--no-history] [--sites sites.json] [--dry-run] [--verbose]
 """
 
+import argparse
+import bisect
+import collections
+import contextlib
+import cProfile
+import heapq
+import hashlib
+import itertools
 import json
 import os
+import pickle
+import posixpath
+import pstats
+import re
+import sqlite3
+import sys
+import time
+import urllib.parse
 import datetime
+import fnmatch
+import functools
+import gzip
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from xml.sax.saxutils import escape as xml_escape
+
+try:
+    import numpy as np
+except ImportError:  # the cost engine falls back to plain Python
+    np = None
+
+try:
+    import brotli
+except ImportError:  # only .gz siblings are written
+    brotli = None
 
 # --- Paths ---
 BASE_DIR = Path(__file__).parent
 DATA_FILE = BASE_DIR / "data" / "plans_data.json"
 OUTPUT_DIR = BASE_DIR / "output"
 STATIC_DIR = BASE_DIR / "static"
+BUILD_DIR = BASE_DIR / ".build"
+MANIFEST_FILE = BUILD_DIR / "manifest.json"
+CHANGED_FILES = BUILD_DIR / "changed_files.txt"
+STATS_FILE = BUILD_DIR / "stats.json"
+# Build-machine state, not committed: keep it (or back it up) between builds,
+# since a fresh file restarts every trend from the day it is created
+PRICE_HISTORY_FILE = BASE_DIR / "data" / "price_history.sqlite3"
+SITEMAP_FILE = BASE_DIR / "sitemap.xml"
+
+# Public address of the site, used for the absolute URLs in sitemap.xml
+SITE_URL = "https://keny0823.github.io/kakuyasu-simlab/"
+# Sitemap protocol limit; past it the URLs are split into sitemap-N.xml parts
+SITEMAP_MAX_URLS = 50000
+
+# All-pairs comparison pages are spread over 256 shard directories
+PAIRS_DIR = OUTPUT_DIR / "pairs"
+# Link listings are split into pages of this many entries; the top page
+# shows at most INDEX_SECTION_LIMIT links per section and links to the rest
+LIST_PAGE_SIZE = 100
+INDEX_SECTION_LIMIT = 30
+# Plans per page of the comparison table
+TABLE_PAGE_SIZE = 50
+# Monthly price boundaries (yen) used by the "price-band" pair filter
+PRICE_BANDS = (1000, 2000, 3000)
+
+# Changes whenever the templates in this file change, so every page is rebuilt
+TEMPLATE_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:12]
 
 # --- Load Data ---
-def load_data():
-    with open(DATA_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+# Required plan keys and the types they must have
+PLAN_SCHEMA = {
+    'id': str,
+    'carrier': str,
+    'parent': str,
+    'monthly_price': int,
+    'data_gb': (int, float),
+    'data_gb_large': (int, float),
+    'large_plan_price': int,
+    'call_included': str,
+    'network': str,
+    'min_contract': str,
+    'initial_cost': int,
+    'esim': bool,
+    'overseas': bool,
+    'family_discount': bool,
+    'features': list,
+    'cons': list,
+    'best_for': str,
+    'affiliate_url': str,
+    'official_url': str,
+    'logo_emoji': str,
+}
+
+# A ranking needs either a hand-written ranking_order or score weights
+RANKING_SCHEMA = {
+    'id': str,
+    'title': str,
+    'description': str,
+}
+
+
+class CatalogueError(ValueError):
+    """plans_data.json failed validation; ``problems`` lists every issue found."""
+
+    def __init__(self, problems):
+        super().__init__("\n".join(problems))
+        self.problems = problems
+
+
+def _check_record(record, schema, where, problems):
+    if not isinstance(record, dict):
+        problems.append(f"{where}: オブジェクトではありません")
+        return
+    for key, expected in schema.items():
+        if key not in record:
+            problems.append(f"{where}: 必須キー '{key}' がありません")
+            continue
+        value = record[key]
+        # bool is a subclass of int, so a stray true/false must not pass as a number
+        if (isinstance(value, bool) and expected is not bool) or not isinstance(value, expected):
+            problems.append(f"{where}: '{key}' の型が不正です ({type(value).__name__})")
+
+
+def validate_catalogue(raw):
+    """Check the whole catalogue and raise CatalogueError listing every problem."""
+    if not isinstance(raw, dict):
+        raise CatalogueError(["トップレベルがオブジェクトではありません"])
+    problems = []
+    plans = raw.get('sim_plans')
+    if not isinstance(plans, list) or not plans:
+        raise CatalogueError(["'sim_plans' がないか空です"])
+    for key in ('compare_pairs', 'ranking_articles'):
+        if not isinstance(raw.get(key, []), list):
+            problems.append(f"'{key}' がリストではありません")
+    if problems:
+        raise CatalogueError(problems)
+
+    ids = set()
+    for i, plan in enumerate(plans):
+        has_id = isinstance(plan, dict) and isinstance(plan.get('id'), str)
+        where = f"sim_plans[{i}]" + (f" ({plan['id']})" if has_id else "")
+        _check_record(plan, PLAN_SCHEMA, where, problems)
+        if has_id:
+            if plan['id'] in ids:
+                problems.append(f"{where}: idが重複しています")
+            ids.add(plan['id'])
+
+    for i, pair in enumerate(raw.get('compare_pairs', [])):
+        if not isinstance(pair, list) or len(pair) != 2:
+            problems.append(f"compare_pairs[{i}]: 2つのプランIDのリストではありません")
+            continue
+        for plan_id in pair:
+            if not isinstance(plan_id, str) or plan_id not in ids:
+                problems.append(f"compare_pairs[{i}]: 不明なプランID {plan_id!r}")
+
+    for i, ranking in enumerate(raw.get('ranking_articles', [])):
+        where = f"ranking_articles[{i}]"
+        _check_record(ranking, RANKING_SCHEMA, where, problems)
+        if not isinstance(ranking, dict):
+            continue
+        if isinstance(ranking.get('weights'), dict):
+            for key, weight in ranking['weights'].items():
+                if key not in SCORE_ATTRIBUTES:
+                    problems.append(f"{where}: 不明なスコア項目 '{key}'")
+                elif isinstance(weight, bool) or not isinstance(weight, (int, float)):
+                    problems.append(f"{where}: '{key}' の重みが数値ではありません")
+            variants = ranking.get('variants', [])
+            if not isinstance(variants, list):
+                problems.append(f"{where}: 'variants' がリストではありません")
+                variants = []
+            for variant in variants:
+                if not isinstance(variant, str) or variant not in RANKING_VARIANTS:
+                    problems.append(f"{where}: 不明なバリエーション {variant!r}")
+        elif isinstance(ranking.get('ranking_order'), list):
+            for plan_id in ranking['ranking_order']:
+                if not isinstance(plan_id, str) or plan_id not in ids:
+                    problems.append(f"{where}: 不明なプランID {plan_id!r}")
+        else:
+            problems.append(f"{where}: 'ranking_order' か 'weights' が必要です")
+
+    if problems:
+        raise CatalogueError(problems)
+
+
+def normalize_catalogue(raw):
+    """Fill in optional fields so generators never need .get() fallbacks."""
+    raw.setdefault('compare_pairs', [])
+    raw.setdefault('ranking_articles', [])
+    for plan in raw['sim_plans']:
+        plan.setdefault('affiliate_pixel', "")
+        plan.setdefault('speed_down', "")
+    return raw
+
+
+# Boolean plan fields usable as listing filters, with their display labels
+FEATURE_FLAGS = {
+    'esim': "eSIM対応",
+    'overseas': "海外でも使える",
+    'family_discount': "家族割がある",
+    'has_rollover': "データ繰り越しができる",
+    'has_store_support': "店舗でサポートを受けられる",
+}
+
+
+def enrich_plan(plan):
+    """Derive flags and short labels from a plan's free text, once per load."""
+    raw = json.dumps(plan, ensure_ascii=False, sort_keys=True)
+    plan['content_hash'] = hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+    plan['has_rollover'] = not any("繰り越し不可" in c for c in plan['cons'])
+    plan['has_store_support'] = any("ショップ" in f or "店舗" in f or "対面" in f for f in plan['features'])
+    plan['feature_heads'] = [feat.split("（")[0].split("で")[0] for feat in plan['features']]
+    plan['feature_tags'] = [feat.split("（")[0][:20] for feat in plan['features'][:3]]
+    plan['network_short'] = plan['network'].split(' ')[0]
+    plan['call_short'] = plan['call_included'][:15]
+    plan['free_call_minutes'] = free_call_minutes(plan['call_included'])
+    return plan
+
+
+class Catalogue(dict):
+    """The parsed plans_data.json plus lookup maps built once at load time."""
+
+    def __init__(self, raw):
+        super().__init__(raw)
+        for plan in self['sim_plans']:
+            enrich_plan(plan)
+        self.by_id = {p['id']: p for p in self['sim_plans']}
+        # feature flag -> plans that have it, in catalogue order
+        self.by_flag = {flag: [p for p in self['sim_plans'] if p[flag]] for flag in FEATURE_FLAGS}
+        self.costs = compute_costs(self['sim_plans'], USAGE_PROFILES)
+        self['ranking_articles'] = resolve_rankings(self['sim_plans'], self.get('ranking_articles', []),
+                                                    self.costs)
+        self.rankings = {r['id']: r for r in self.get('ranking_articles', [])}
+
+        # plan id -> [(other plan id, pair)] in compare_pairs order
+        self.partners = {}
+        for pair in self.get('compare_pairs', []):
+            self.partners.setdefault(pair[0], []).append((pair[1], pair))
+            self.partners.setdefault(pair[1], []).append((pair[0], pair))
+
+        # Filled from the price history store by attach_price_history()
+        self.price_history = {}
+        self.price_changes = []
+
+
+def _cache_file(path):
+    key = hashlib.sha1(str(Path(path).resolve()).encode('utf-8')).hexdigest()[:12]
+    return BUILD_DIR / f"catalogue-{key}.pickle"
+
+
+def _save_cache(cache_file, entry):
+    try:
+        os.makedirs(BUILD_DIR, exist_ok=True)
+        tmp = cache_file.with_name(f".{cache_file.name}.{os.getpid()}.tmp")
+        with open(tmp, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_file)
+    except OSError:
+        pass  # the cache only speeds up the next run
+
+
+def load_data(path=DATA_FILE):
+    """Load, validate and index the catalogue, reusing the compiled cache if current.
+
+    The cache is keyed by the template version and the source file's hash.
+    An unchanged mtime and size skip even the hashing; a touched but identical
+    file is re-hashed and its cache entry refreshed.
+    """
+    st = os.stat(path)
+    cache_file = _cache_file(path)
+    try:
+        with open(cache_file, 'rb') as f:
+            entry = pickle.load(f)
+        if entry['version'] != TEMPLATE_VERSION:
+            entry = None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError, TypeError):
+        entry = None
+
+    if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+        return entry['catalogue']
+
+    with open(path, 'rb') as f:
+        source = f.read()
+    digest = hashlib.sha256(source).hexdigest()
+    if entry and entry['sha256'] == digest:
+        catalogue = entry['catalogue']
+    else:
+        try:
+            raw = json.loads(source.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise CatalogueError([f"{path}: JSONとして読み込めません（{e}）"]) from e
+        validate_catalogue(raw)
+        catalogue = Catalogue(normalize_catalogue(raw))
+
+    _save_cache(cache_file, {
+        'version': TEMPLATE_VERSION,
+        'mtime_ns': st.st_mtime_ns,
+        'size': st.st_size,
+        'sha256': digest,
+        'catalogue': catalogue,
+    })
+    return catalogue
 
 def get_plan(data, plan_id):
-    for p in data['sim_plans']:
-        if p['id'] == plan_id:
-            return p
-    return None
+    return data.by_id.get(plan_id)
+
+# --- Price History ---
+# Rows shown in a review's price trend table, how long a price change
+# keeps its badge, and entries on the price change feed page
+PRICE_TREND_ROWS = 12
+PRICE_BADGE_DAYS = 90
+PRICE_FEED_LIMIT = 100
+
+
+class PriceHistory:
+    """SQLite store of every plan's monthly price over time.
+
+    ``prices`` holds one row per plan and day the price was first seen or
+    changed, so the price on any date is the latest row at or before it.
+    ``price_changes`` is appended from the diff at record time, which keeps
+    the change feed a single indexed query.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS prices (
+            plan_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            monthly_price INTEGER NOT NULL,
+            PRIMARY KEY (plan_id, date)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS price_changes (
+            date TEXT NOT NULL,
+            plan_id TEXT NOT NULL,
+            old_price INTEGER NOT NULL,
+            new_price INTEGER NOT NULL,
+            PRIMARY KEY (plan_id, date)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS price_changes_by_date ON price_changes (date);
+        CREATE TABLE IF NOT EXISTS snapshots (
+            date TEXT PRIMARY KEY,
+            plans INTEGER NOT NULL,
+            sha256 TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path=PRICE_HISTORY_FILE):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(self.SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def record(self, data, day):
+        """Store the catalogue's prices as of ``day``; return [(plan id, old, new)] changed."""
+        day = day.isoformat()
+        changes = []
+        with self.db:
+            for plan in data['sim_plans']:
+                plan_id, price = plan['id'], plan['monthly_price']
+                before = self._scalar("SELECT monthly_price FROM prices WHERE plan_id = ? AND date < ? "
+                                      "ORDER BY date DESC LIMIT 1", plan_id, day)
+                today = self._scalar("SELECT monthly_price FROM prices WHERE plan_id = ? AND date = ?",
+                                     plan_id, day)
+                if today == price:
+                    continue
+                # Several builds on one day keep a single row, compared with the day before
+                self.db.execute("DELETE FROM price_changes WHERE plan_id = ? AND date = ?", (plan_id, day))
+                if before == price:
+                    self.db.execute("DELETE FROM prices WHERE plan_id = ? AND date = ?", (plan_id, day))
+                    continue
+                self.db.execute("INSERT OR REPLACE INTO prices VALUES (?, ?, ?)", (plan_id, day, price))
+                if before is not None:
+                    self.db.execute("INSERT INTO price_changes VALUES (?, ?, ?, ?)",
+                                    (day, plan_id, before, price))
+                    changes.append((plan_id, before, price))
+            digest = hashlib.sha256(json.dumps(data['sim_plans'], ensure_ascii=False, sort_keys=True)
+                                    .encode('utf-8')).hexdigest()
+            self.db.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)",
+                            (day, len(data['sim_plans']), digest))
+        return changes
+
+    def _scalar(self, sql, *params):
+        row = self.db.execute(sql, params).fetchone()
+        return row[0] if row else None
+
+    def latest_price(self, plan_id):
+        return self._scalar("SELECT monthly_price FROM prices WHERE plan_id = ? "
+                            "ORDER BY date DESC LIMIT 1", plan_id)
+
+    def price_on(self, plan_id, day):
+        """The plan's price on ``day``, or None if it was not listed yet."""
+        return self._scalar("SELECT monthly_price FROM prices WHERE plan_id = ? AND date <= ? "
+                            "ORDER BY date DESC LIMIT 1", plan_id, day.isoformat())
+
+    def recent_changes(self, since=None, limit=PRICE_FEED_LIMIT):
+        """Newest price changes first, as (date, plan id, old price, new price)."""
+        return self.db.execute(
+            "SELECT date, plan_id, old_price, new_price FROM price_changes WHERE date >= ? "
+            "ORDER BY date DESC, plan_id LIMIT ?",
+            ((since or datetime.date.min).isoformat(), limit)).fetchall()
+
+    def trends(self, rows=PRICE_TREND_ROWS):
+        """Map each plan id to its newest ``rows`` (date, price) entries, newest first."""
+        trends = {}
+        for plan_id, day, price in self.db.execute(
+                "SELECT plan_id, date, monthly_price FROM ("
+                "  SELECT *, ROW_NUMBER() OVER (PARTITION BY plan_id ORDER BY date DESC) AS n FROM prices"
+                ") WHERE n <= ? ORDER BY plan_id, date DESC", (rows,)):
+            trends.setdefault(plan_id, []).append((day, price))
+        return trends
+
+
+def attach_price_history(data, history):
+    """Copy the price trends and the change feed the generators need onto the catalogue."""
+    # One row beyond the table, so its oldest row still shows the change into it
+    data.price_history = history.trends(PRICE_TREND_ROWS + 1)
+    data.price_changes = history.recent_changes()
+
+
+def price_badge(data, plan_id, ctx):
+    """A "price changed since" badge, for changes within PRICE_BADGE_DAYS of the build."""
+    trend = data.price_history.get(plan_id, [])
+    if len(trend) < 2:
+        return ""
+    (day, price), (_, before) = trend[0], trend[1]
+    since = datetime.date.fromisoformat(day)
+    if not 0 <= (ctx.date - since).days <= PRICE_BADGE_DAYS:
+        return ""
+    direction, text = ("down", "値下げ") if price < before else ("up", "値上げ")
+    return f'<span class="price-change {direction}">{since.month}月{since.day}日から{text}</span>'
+
+
+# --- Cost Simulation ---
+# Usage grid: GB per month x call minutes per month x lines in the family
+USAGE_GB = (1, 3, 5, 10, 20, 50, 100)
+USAGE_CALL_MINUTES = (0, 30, 60, 120)
+USAGE_LINES = (1, 2, 4)
+USAGE_PROFILES = tuple(itertools.product(USAGE_GB, USAGE_CALL_MINUTES, USAGE_LINES))
+
+AMORTIZE_MONTHS = 24          # initial_cost is spread over this many months
+CALL_RATE_YEN_PER_MIN = 44    # 22円/30秒 outside any free allowance
+FAMILY_DISCOUNT_YEN = 550     # per line per month, from the second line on
+AVG_CALL_MINUTES = 3          # "N分かけ放題" covers every call when N >= this
+UNLIMITED_LARGE_PRICE = 3278  # large_plan_price == -1 (e.g. 楽天の無制限)
+UNLIMITED = -1
+
+# Profiles shown in comparison articles, and the "best plan for X" pages
+COMPARISON_PROFILES = ((3, 0, 1), (20, 0, 1), (50, 60, 1), (20, 0, 4))
+BEST_PAGE_GB = USAGE_GB
+BEST_PAGE_CALL_MINUTES = (0, 60)
+BEST_PAGE_LIMIT = 5
+
+
+def free_call_minutes(call_included):
+    """Free domestic call minutes per month, or UNLIMITED."""
+    if "通話無料" in call_included:
+        return UNLIMITED
+    m = re.search(r"(\d+)分かけ放題", call_included)
+    if m:
+        return UNLIMITED if int(m.group(1)) >= AVG_CALL_MINUTES else 0
+    m = re.search(r"無料通話(\d+)分", call_included)
+    return int(m.group(1)) if m else 0
+
+
+class CostTable:
+    """Effective monthly and first-year cost of every plan for every usage profile.
+
+    ``monthly[i][j]`` and ``annual[i][j]`` are whole yen for plan ``i`` and
+    profile ``j``, or None when no tier of the plan covers that much data.
+    """
+
+    def __init__(self, plan_ids, profiles, monthly, annual):
+        self.plan_ids = plan_ids
+        self.profiles = profiles
+        self.monthly = monthly
+        self.annual = annual
+        self._row = {plan_id: i for i, plan_id in enumerate(plan_ids)}
+        self._col = {profile: j for j, profile in enumerate(profiles)}
+
+    def monthly_cost(self, plan_id, profile):
+        return self.monthly[self._row[plan_id]][self._col[profile]]
+
+    def annual_cost(self, plan_id, profile):
+        return self.annual[self._row[plan_id]][self._col[profile]]
+
+    def cheapest(self, profile, limit=None):
+        """(plan id, monthly, annual) of every plan covering the profile, cheapest first."""
+        j = self._col[profile]
+        rows = [(self.monthly[i][j], self.annual[i][j], plan_id)
+                for i, plan_id in enumerate(self.plan_ids) if self.monthly[i][j] is not None]
+        rows.sort()
+        return [(plan_id, monthly, annual) for monthly, annual, plan_id in rows[:limit]]
+
+
+def usage_label(profile):
+    gb, minutes, lines = profile
+    calls = f"通話{minutes}分" if minutes else "通話なし"
+    family = f"・{lines}人家族" if lines > 1 else ""
+    return f"月{gb}GB・{calls}{family}"
+
+
+def _plan_cost_inputs(plan):
+    large_price = UNLIMITED_LARGE_PRICE if plan['large_plan_price'] == -1 else plan['large_plan_price']
+    return (
+        plan['monthly_price'],
+        plan['data_gb'],
+        float('inf') if plan['data_gb_large'] == -1 else plan['data_gb_large'],
+        large_price,  # 0 means the plan has no larger tier
+        float('inf') if plan['free_call_minutes'] == UNLIMITED else plan['free_call_minutes'],
+        FAMILY_DISCOUNT_YEN if plan['family_discount'] else 0,
+        plan['initial_cost'],
+    )
+
+
+def compute_costs(plans, profiles, months=AMORTIZE_MONTHS):
+    """Cost every plan under every profile in one batch (NumPy when available)."""
+    inputs = [_plan_cost_inputs(plan) for plan in plans]
+    plan_ids = [plan['id'] for plan in plans]
+    if not inputs or not profiles:
+        return CostTable(plan_ids, profiles, [[] for _ in plans], [[] for _ in plans])
+    if np is None:
+        monthly, annual = _compute_costs_py(inputs, profiles, months)
+    else:
+        monthly, annual = _compute_costs_np(inputs, profiles, months)
+    return CostTable(plan_ids, profiles, monthly, annual)
+
+
+def _compute_costs_np(inputs, profiles, months):
+    cols = np.array(inputs, dtype=np.float64).T[:, :, None]
+    base_price, base_gb, large_gb, large_price, free_min, discount, initial = cols
+    gb, minutes, lines = np.array(profiles, dtype=np.float64).T[:, None, :]
+
+    line = np.where(gb <= base_gb, base_price,
+                    np.where((large_price > 0) & (gb <= large_gb), large_price, -1.0))
+    calls = np.maximum(minutes - free_min, 0) * CALL_RATE_YEN_PER_MIN
+    per_line = np.maximum(line + calls - np.where(lines >= 2, discount, 0), 0)
+    recurring = (per_line * lines).astype(np.int64)
+    setup = (initial * lines).astype(np.int64)
+    monthly = recurring + (setup + months // 2) // months
+    annual = recurring * 12 + setup
+
+    covered = line >= 0
+    monthly = np.where(covered, monthly, -1).tolist()
+    annual = np.where(covered, annual, -1).tolist()
+    return ([[v if v >= 0 else None for v in row] for row in monthly],
+            [[v if v >= 0 else None for v in row] for row in annual])
+
+
+def _compute_costs_py(inputs, profiles, months):
+    monthly, annual = [], []
+    for base_price, base_gb, large_gb, large_price, free_min, discount, initial in inputs:
+        m_row, a_row = [], []
+        for gb, minutes, lines in profiles:
+            if gb <= base_gb:
+                line = base_price
+            elif large_price > 0 and gb <= large_gb:
+                line = large_price
+            else:
+                m_row.append(None)
+                a_row.append(None)
+                continue
+            calls = max(minutes - free_min, 0) * CALL_RATE_YEN_PER_MIN
+            per_line = max(line + calls - (discount if lines >= 2 else 0), 0)
+            recurring = int(per_line * lines)
+            setup = initial * lines
+            m_row.append(recurring + (setup + months // 2) // months)
+            a_row.append(recurring * 12 + setup)
+        monthly.append(m_row)
+        annual.append(a_row)
+    return monthly, annual
+
+
+# --- Score-Based Rankings ---
+# Plan attributes a ranking's "weights" can refer to, each scored 0..1
+SCORE_ATTRIBUTES = ('price', 'data', 'esim', 'overseas', 'store_support', 'family_discount', 'rollover')
+RANKING_GB_BANDS = (3, 20, 50)
+# 'price' is the effective monthly cost at this usage, so it prices the same
+# tier the 'data' score can credit; plans that cannot cover it score 0
+SCORE_PRICE_PROFILE = (20, 0, 1)
+RANKING_LIMIT = 20
+NETWORKS = {'docomo': "ドコモ", 'au': "au", 'softbank': "ソフトバンク", 'rakuten': "楽天"}
+
+
+def _network_groups(plans, costs):
+    for slug, name in NETWORKS.items():
+        members = {p['id'] for p in plans if name in p['network']}
+        yield slug, f"{name}回線", members, 'price'
+
+
+def _gb_band_groups(plans, costs):
+    for gb in RANKING_GB_BANDS:
+        profile = (gb, 0, 1)
+        members = {p['id'] for p in plans if costs.monthly_cost(p['id'], profile) is not None}
+        yield f"{gb}gb", f"月{gb}GB向け", members, f"price_{gb}gb"
+
+
+# variant name -> function yielding (slug, label, member ids, price column)
+RANKING_VARIANTS = {
+    'network': _network_groups,
+    'gb': _gb_band_groups,
+}
+
+
+def score_columns(plans, costs):
+    """Column name -> per-plan scores in 0..1 (higher is better)."""
+    def scaled(values, invert=False):
+        known = [v for v in values if v is not None]
+        lo, hi = (min(known), max(known)) if known else (0, 0)
+        span = hi - lo
+        out = []
+        for v in values:
+            if v is None:
+                out.append(0.0)
+            elif span == 0:
+                out.append(1.0)
+            else:
+                out.append((hi - v) / span if invert else (v - lo) / span)
+        return out
+
+    finite_large = [p['data_gb_large'] for p in plans if p['data_gb_large'] != -1] or [1]
+    top_data = max(max(finite_large), max(p['data_gb'] for p in plans))
+    columns = {
+        'price': scaled([costs.monthly_cost(p['id'], SCORE_PRICE_PROFILE) for p in plans], invert=True),
+        'data': [1.0 if p['data_gb_large'] == -1 else max(p['data_gb'], p['data_gb_large']) / top_data
+                 for p in plans],
+        'esim': [float(p['esim']) for p in plans],
+        'overseas': [float(p['overseas']) for p in plans],
+        'store_support': [float(p['has_store_support']) for p in plans],
+        'family_discount': [float(p['family_discount']) for p in plans],
+        'rollover': [float(p['has_rollover']) for p in plans],
+    }
+    for gb in RANKING_GB_BANDS:
+        columns[f"price_{gb}gb"] = scaled(
+            [costs.monthly_cost(p['id'], (gb, 0, 1)) for p in plans], invert=True)
+    return columns
+
+
+def score_plans(columns, weight_vectors):
+    """Score every plan against every weight vector in one batch.
+
+    ``weight_vectors`` are {column: weight} dicts; returns one list of plan
+    scores per vector, rounded so NumPy and plain Python sort identically.
+    """
+    names = list(columns)
+    if np is not None:
+        features = np.array([columns[name] for name in names], dtype=np.float64).T
+        weights = np.array([[w.get(name, 0.0) for w in weight_vectors] for name in names],
+                           dtype=np.float64)
+        return np.round(features @ weights, 9).T.tolist()
+    n = len(columns[names[0]])
+    return [[round(sum(w.get(name, 0.0) * columns[name][i] for name in names), 9) for i in range(n)]
+            for w in weight_vectors]
+
+
+def resolve_rankings(plans, articles, costs):
+    """Turn weight-based ranking articles (and their variants) into ranking_order lists.
+
+    Articles with a hand-written ranking_order are kept as they are. Every
+    weight profile and variant is scored in a single score_plans() call.
+    """
+    scored = [a for a in articles if 'weights' in a]
+    if not scored:
+        return articles
+
+    jobs = []  # (article, variant slug, label, member ids or None, weight vector)
+    for article in scored:
+        jobs.append((article, None, None, None, dict(article['weights'])))
+        for variant in article.get('variants', []):
+            for slug, label, members, price_column in RANKING_VARIANTS[variant](plans, costs):
+                if len(members) < 2:
+                    continue
+                weights = dict(article['weights'])
+                weights[price_column] = weights.pop('price', 0.0)
+                jobs.append((article, slug, label, members, weights))
+
+    scores = score_plans(score_columns(plans, costs), [job[4] for job in jobs])
+    resolved = {}
+    for (article, slug, label, members, _), plan_scores in zip(jobs, scores):
+        order = sorted(range(len(plans)), key=lambda i: (-plan_scores[i], i))
+        ids = [plans[i]['id'] for i in order if members is None or plans[i]['id'] in members]
+        limit = article.get('limit', RANKING_LIMIT)
+        ranking = dict(article, ranking_order=ids[:limit])
+        if slug is not None:
+            ranking.update(id=f"{article['id']}_{slug}", title=f"{article['title']}（{label}）",
+                           variant_of=article['id'])
+        resolved.setdefault(article['id'], []).append(ranking)
+
+    out = []
+    for article in articles:
+        out.extend(resolved.get(article['id'], [article]))
+    return out
+
 
 # --- HTML Building Blocks ---
-def html_header(title, description, canonical_path=""):
-    today = datetime.date.today().strftime("%Y年%m月%d日")
-    return f"""<!DOCTYPE html>
+HEADER_TEMPLATE = """<!DOCTYPE html>
 <html lang="ja">
 <head>
   <meta charset="UTF-8">
   <meta name="viewport" content="width=device-width, initial-scale=1.0">
-  <title>{title} | 格安SIMラボ</title>
+  <title>{title} | {site_name}</title>
   <meta name="description" content="{description}">
-  <link rel="stylesheet" href="../static/style.css">
+  <link rel="stylesheet" href="{root}static/{stylesheet}">
 </head>
 <body>
   <header class="site-header">
     <div class="container">
-      <a href="../index.html" class="site-logo">🔬 格安SIM<span>ラボ</span></a>
+      <a href="{root}index.html" class="site-logo">{site_logo}</a>
       <nav class="site-nav">
-        <a href="../index.html">トップ</a>
-        <a href="../output/ranking_overall.html">おすすめランキング</a>
+        <a href="{root}index.html">トップ</a>
+        <a href="{root}output/ranking_overall.html">おすすめランキング</a>
       </nav>
     </div>
   </header>
@@ -59,22 +737,14 @@ def html_header(title, description, canonical_path=""):
       <div class="article-body">
 """
 
-def html_footer(related_links=None):
-    related = ""
-    if related_links:
-        related = '<div class="related-articles"><h3>📚 関連記事</h3><ul>'
-        for text, href in related_links:
-            related += f'<li><a href="{href}">👉 {text}</a></li>'
-        related += '</ul></div>'
-
-    return f"""
+FOOTER_TEMPLATE = """
         {related}
       </div>
     </div>
   </main>
   <footer class="site-footer">
     <div class="container">
-      <p>&copy; {datetime.date.today().year} 格安SIMラボ - 格安SIM比較サイト</p>
+      <p>&copy; {year} {site_name} - 格安SIM比較サイト</p>
       <p class="disclaimer">※ 当サイトはアフィリエイトプログラムに参加しています。記事内のリンクから申し込みが行われた場合、当サイトに報酬が支払われることがあります。<br>※ 掲載情報は記事執筆時点のものです。最新情報は各公式サイトでご確認ください。</p>
     </div>
   </footer>
@@ -82,14 +752,197 @@ def html_footer(related_links=None):
 </html>"""
 
 
-def make_cta_html(plan, label=None, sub_text=None):
-    """Generate CTA button HTML with affiliate/official URL fallback."""
-    cta_url = plan['affiliate_url']
-    pixel_html = ""
-    if cta_url.startswith('#'):
-        cta_url = plan['official_url']
-    elif plan.get('affiliate_pixel'):
-        pixel_html = f'<img src="{plan["affiliate_pixel"]}" height="1" width="1" border="0" style="position:absolute">'
+INDEX_HEADER_TEMPLATE = """<!DOCTYPE html>
+<html lang="ja">
+<head>
+  <meta charset="UTF-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1.0">
+  <title>{site_name} | 格安SIM・ネット回線 比較サイト</title>
+  <meta name="description" content="格安SIMを料金・速度・サポートで徹底比較。あなたにぴったりの格安SIMが見つかります。">
+  <link rel="stylesheet" href="static/{stylesheet}">
+</head>
+<body>
+  <header class="site-header">
+    <div class="container">
+      <a href="index.html" class="site-logo">{site_logo}</a>
+      <nav class="site-nav">
+        <a href="index.html">トップ</a>
+        <a href="output/ranking_overall.html">おすすめランキング</a>
+      </nav>
+    </div>
+  </header>
+  <main class="main-content">
+    <div class="container">
+      <div class="article-header">
+        <h1>{site_heading}<br>あなたにベストな格安SIMを見つけよう</h1>
+        <p class="article-meta">最終更新: <time>{today}</time></p>
+      </div>
+"""
+
+INDEX_FOOTER_TEMPLATE = """      </div>
+    </div>
+  </main>
+  <footer class="site-footer">
+    <div class="container">
+      <p>&copy; {year} {site_name}</p>
+      <p class="disclaimer">※ 当サイトはアフィリエイトプログラムに参加しています。</p>
+    </div>
+  </footer>
+</body>
+</html>"""
+
+
+def compile_template(template, **constants):
+    """Fill in per-build constants once and split the rest into static chunks.
+
+    The result alternates static text and field names: [text, field, text, ...].
+    """
+    for name, value in constants.items():
+        template = template.replace("{" + name + "}", str(value))
+    return re.split(r"\{(\w+)\}", template)
+
+
+def fill_template(chunks, **fields):
+    parts = list(chunks)
+    for i in range(1, len(parts), 2):
+        parts[i] = fields[parts[i]]
+    return "".join(parts)
+
+
+class SiteVariant:
+    """Branding, affiliate handling and output root of one site built from the catalogue.
+
+    ``affiliate`` is 'plan' (each plan's affiliate_url and pixel, falling
+    back to the official site), 'official' (always the official site, no
+    pixel) or a URL template with {official_url} and {plan_id} fields for
+    another affiliate network. ``affiliate_urls`` overrides single plans.
+    """
+
+    def __init__(self, id="main", name="格安SIMラボ", logo="🔬 格安SIM<span>ラボ</span>",
+                 heading="🔬 格安SIMラボ", root=BASE_DIR, affiliate="plan", affiliate_urls=None):
+        self.id = id
+        self.name = name
+        self.logo = logo
+        self.heading = heading
+        self.root = Path(root)
+        self.affiliate = affiliate
+        self.affiliate_urls = dict(affiliate_urls or {})
+
+    def key(self):
+        """Everything that changes the pages of this site, for page hashes."""
+        return [self.id, self.name, self.logo, self.heading, os.path.relpath(self.root, BASE_DIR),
+                self.affiliate, sorted(self.affiliate_urls.items())]
+
+    def affiliate_link(self, plan):
+        """Return (CTA url, tracking pixel HTML) for a plan on this site."""
+        if plan['id'] in self.affiliate_urls:
+            return self.affiliate_urls[plan['id']], ""
+        if self.affiliate == 'official':
+            return plan['official_url'], ""
+        if self.affiliate != 'plan':
+            return self.affiliate.format(official_url=urllib.parse.quote(plan['official_url'], safe=""),
+                                         plan_id=plan['id']), ""
+        if plan['affiliate_url'].startswith('#'):
+            return plan['official_url'], ""
+        pixel_html = ""
+        if plan.get('affiliate_pixel'):
+            pixel_html = f'<img src="{plan["affiliate_pixel"]}" height="1" width="1" border="0" style="position:absolute">'
+        return plan['affiliate_url'], pixel_html
+
+
+DEFAULT_SITE = SiteVariant()
+
+
+def load_sites(path):
+    """Read extra site variants from a JSON file: {"sites": [{"id": ..., "root": ...}, ...]}.
+
+    Roots are relative to BASE_DIR. The main site keeps building into
+    BASE_DIR; each variant gets the same pages under its own root.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)['sites']
+    sites = []
+    for entry in entries:
+        entry = dict(entry)
+        root = (BASE_DIR / entry.pop('root')).resolve()
+        if root == BASE_DIR.resolve() or entry['id'] == DEFAULT_SITE.id:
+            raise ValueError(f"サイト {entry['id']} はメインサイトと同じ出力先・IDです")
+        sites.append(SiteVariant(root=root, **entry))
+    return sites
+
+
+class BuildContext:
+    """Constants shared by every page of one build run.
+
+    The date is fixed when the context is created, so a build that runs
+    across midnight still stamps every page with the same day. ``stylesheet``
+    is the file under static/ that pages link, ``minify`` turns on the
+    optimize_html() pass when pages are written and ``site`` is the
+    SiteVariant whose branding and CTA links the pages get. ``variants``
+    holds one context per extra site; see write_page().
+    """
+
+    def __init__(self, build_date=None, stylesheet="style.css", minify=False, site=None, variants=()):
+        self.date = build_date or datetime.date.today()
+        self.year = self.date.year
+        self.today = self.date.strftime("%Y年%m月%d日")
+        self.stylesheet = stylesheet
+        self.minify = minify
+        self.site = site or DEFAULT_SITE
+        self.variants = [BuildContext(self.date, stylesheet, minify, variant) for variant in variants]
+        self._slots = None
+        self._headers = {}
+        branding = {'site_name': self.site.name, 'site_logo': self.site.logo}
+        self._footer = compile_template(FOOTER_TEMPLATE, year=self.year, **branding)
+        self._index_header = fill_template(compile_template(
+            INDEX_HEADER_TEMPLATE, today=self.today, stylesheet=stylesheet,
+            site_heading=self.site.heading, **branding))
+        self._index_footer = fill_template(compile_template(INDEX_FOOTER_TEMPLATE, year=self.year, **branding))
+
+    def header(self, title, description, root="../"):
+        chunks = self._headers.get(root)
+        if chunks is None:
+            chunks = self._headers[root] = compile_template(
+                HEADER_TEMPLATE, root=root, today=self.today, stylesheet=self.stylesheet,
+                site_name=self.site.name, site_logo=self.site.logo)
+        return fill_template(chunks, title=title, description=description)
+
+    def footer(self, related=""):
+        return fill_template(self._footer, related=related)
+
+    def index_header(self):
+        return self._index_header
+
+    def index_footer(self):
+        return self._index_footer
+
+    def cta(self, plan, label=None, sub_text=None):
+        return cta_html(plan, label, sub_text, self.site)
+
+    def slots(self):
+        """The SlotContext that renders page bodies shared by this build's sites."""
+        if self._slots is None:
+            self._slots = SlotContext(self.date, self.stylesheet, self.minify)
+        return self._slots
+
+
+def html_header(title, description, canonical_path="", root="../", ctx=None):
+    return (ctx or BuildContext()).header(title, description, root)
+
+def html_footer(related_links=None, ctx=None):
+    related = ""
+    if related_links:
+        related = ''.join([
+            '<div class="related-articles"><h3>📚 関連記事</h3><ul>',
+            *(f'<li><a href="{href}">👉 {text}</a></li>' for text, href in related_links),
+            '</ul></div>',
+        ])
+    return (ctx or BuildContext()).footer(related)
+
+
+def make_cta_html(plan, label=None, sub_text=None, site=None):
+    """Generate CTA button HTML with the site's affiliate link or the official URL."""
+    cta_url, pixel_html = (site or DEFAULT_SITE).affiliate_link(plan)
     if label is None:
         label = f"{plan['carrier']}の公式サイトはこちら"
     if sub_text is None:
@@ -101,23 +954,60 @@ def make_cta_html(plan, label=None, sub_text=None):
 </a>
 """
 
-# --- Review Article Generator ---
-def generate_review(plan, data):
-    """Generate a single plan review article."""
-    title = f"{plan['carrier']}の評判・メリット・デメリットを徹底解説【{datetime.date.today().year}年最新】"
-    desc = f"{plan['carrier']}の料金、速度、メリット・デメリットを詳しく解説。{plan['best_for']}におすすめ。"
 
-    html = html_header(title, desc)
+# --- Fragment Cache ---
+FRAGMENT_CACHE_SIZE = 8192
 
-    # Intro
-    html += f"""
-<p>{plan['carrier']}は{plan['parent']}が提供する格安SIM/モバイル通信サービスです。</p>
-<p>本記事では、{plan['carrier']}の<strong>料金プラン・通信速度・メリット・デメリット</strong>を余すことなく解説します。「自分に合っているかどうか」の判断材料にしてください。</p>
-"""
 
-    # Price Section
-    html += f'<h2>{plan["logo_emoji"]} {plan["carrier"]}の料金プラン</h2>'
-    html += f"""
+class FragmentCache:
+    """Bounded LRU cache of rendered HTML fragments, with hit/miss counters.
+
+    Keys include the plan's content hash, so an edited plan never gets a
+    stale fragment. The cache is warmed before worker processes start and
+    handed to each of them, so every worker begins with it filled.
+    """
+
+    def __init__(self, maxsize=FRAGMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, render):
+        try:
+            value = self._items[key]
+        except KeyError:
+            self.misses += 1
+            value = self._items[key] = render()
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+            return value
+        self.hits += 1
+        self._items.move_to_end(key)
+        return value
+
+
+FRAGMENTS = FragmentCache()
+
+
+def plan_fragment(name, plan, render, *args):
+    """Return render(plan, *args) from the shared fragment cache."""
+    return FRAGMENTS.get((name, plan['id'], plan['content_hash'], *args), lambda: render(plan, *args))
+
+
+def cta_html(plan, label=None, sub_text=None, site=None):
+    """make_cta_html() through the shared fragment cache."""
+    site = site or DEFAULT_SITE
+    return FRAGMENTS.get(('cta', site.id, plan['id'], plan['content_hash'], label, sub_text),
+                         lambda: make_cta_html(plan, label, sub_text, site))
+
+
+def review_card_html(plan):
+    """The plan card with price and spec table at the top of a review."""
+    return f"""
 <div class="plan-card">
   <div class="plan-card-header">
     <span style="font-size:2rem">{plan['logo_emoji']}</span>
@@ -146,59 +1036,136 @@ def generate_review(plan, data):
 </div>
 """
 
+
+def ranking_card_pitch_html(plan):
+    """The feature tags and target users of a ranking card, up to its CTA."""
+    tags = "".join(f'<span class="feature-tag">✅ {tag}</span>' for tag in plan['feature_tags'])
+    return (tags + """</div>
+    <p style="margin-top:12px"><strong>こんな人におすすめ：</strong>""" + plan['best_for'] + """</p>""")
+
+
+def ranking_card_tail_html(plan):
+    """The review link that closes a ranking card after its CTA."""
+    return f"""
+    <p style="text-align:center"><a href="review_{plan['id']}.html">→ {plan['carrier']}の詳細レビューを読む</a></p>
+  </div>
+</div>
+"""
+
+
+def ranking_cta_args(plan):
+    return plan, f"{plan['carrier']}を申し込む", "※ 公式サイトへ移動します"
+
+
+def prewarm_fragments(data, plan_ids, sites=(DEFAULT_SITE,)):
+    """Render the CTAs (one set per site) and plan cards of these plans into the fragment cache."""
+    for plan_id in itertools.islice(plan_ids, FRAGMENTS.maxsize // (3 + 2 * len(sites))):
+        plan = get_plan(data, plan_id)
+        for site in sites:
+            cta_html(plan, site=site)
+            cta_html(*ranking_cta_args(plan), site=site)
+        plan_fragment('review_card', plan, review_card_html)
+        plan_fragment('ranking_card_pitch', plan, ranking_card_pitch_html)
+        plan_fragment('ranking_card_tail', plan, ranking_card_tail_html)
+
+
+# --- Review Article Generator ---
+def iter_review(plan, data, ctx=None):
+    """Yield a single plan review article as HTML fragments."""
+    ctx = ctx or BuildContext()
+    title = f"{plan['carrier']}の評判・メリット・デメリットを徹底解説【{ctx.year}年最新】"
+    desc = f"{plan['carrier']}の料金、速度、メリット・デメリットを詳しく解説。{plan['best_for']}におすすめ。"
+
+    yield html_header(title, desc, ctx=ctx)
+
+    # Intro
+    yield f"""
+<p>{plan['carrier']}は{plan['parent']}が提供する格安SIM/モバイル通信サービスです。</p>
+<p>本記事では、{plan['carrier']}の<strong>料金プラン・通信速度・メリット・デメリット</strong>を余すことなく解説します。「自分に合っているかどうか」の判断材料にしてください。</p>
+"""
+
+    # Price Section
+    yield f'<h2>{plan["logo_emoji"]} {plan["carrier"]}の料金プラン</h2>'
+    badge = price_badge(data, plan['id'], ctx)
+    if badge:
+        yield f'<p>{badge}</p>'
+    yield plan_fragment('review_card', plan, review_card_html)
+
+    trend = data.price_history.get(plan['id'], [])
+    if len(trend) > 1:
+        yield f'<h3>💹 {plan["carrier"]}の料金推移</h3>'
+        yield '\n<table class="compare-table">\n  <tr><th>改定日</th><th>月額料金</th><th>変動</th></tr>\n'
+        for (day, price), older in itertools.zip_longest(trend[:PRICE_TREND_ROWS], trend[1:]):
+            if older is None:
+                change = "掲載開始"
+            elif price < older[1]:
+                change = f'<span class="winner">▼ {older[1] - price:,}円</span>'
+            else:
+                change = f"▲ {price - older[1]:,}円"
+            date = datetime.date.fromisoformat(day)
+            yield f"  <tr><td>{date.year}年{date.month}月{date.day}日</td><td>{price:,}円</td><td>{change}</td></tr>\n"
+        yield "</table>\n"
+
     # Merits
-    html += f'<h2>✅ {plan["carrier"]}のメリット</h2>'
-    html += '<ul>'
-    for feat in plan['features']:
-        html += f'<li><strong>{feat.split("（")[0].split("で")[0]}</strong> — {feat}</li>'
-    html += '</ul>'
+    yield f'<h2>✅ {plan["carrier"]}のメリット</h2>'
+    yield '<ul>'
+    for head, feat in zip(plan['feature_heads'], plan['features']):
+        yield f'<li><strong>{head}</strong> — {feat}</li>'
+    yield '</ul>'
 
     # Demerits
-    html += f'<h2>⚠️ {plan["carrier"]}のデメリット</h2>'
-    html += '<ul>'
+    yield f'<h2>⚠️ {plan["carrier"]}のデメリット</h2>'
+    yield '<ul>'
     for con in plan['cons']:
-        html += f'<li>{con}</li>'
-    html += '</ul>'
+        yield f'<li>{con}</li>'
+    yield '</ul>'
 
     # Who is this for?
-    html += f'<h2>🎯 {plan["carrier"]}はこんな人におすすめ</h2>'
-    html += f'<div class="verdict-box"><h3 style="color:var(--primary);border:none">{plan["best_for"]}</h3></div>'
+    yield f'<h2>🎯 {plan["carrier"]}はこんな人におすすめ</h2>'
+    yield f'<div class="verdict-box"><h3 style="color:var(--primary);border:none">{plan["best_for"]}</h3></div>'
 
     # CTA
-    html += make_cta_html(plan)
+    yield ctx.cta(plan)
 
     # Related
     related = []
-    for pair in data.get('compare_pairs', []):
-        if plan['id'] in pair:
-            other_id = pair[0] if pair[1] == plan['id'] else pair[1]
-            other = get_plan(data, other_id)
-            if other:
-                related.append((
-                    f"{plan['carrier']} vs {other['carrier']} 徹底比較",
-                    f"compare_{plan['id']}_vs_{other_id}.html"
-                ))
+    for other_id, pair in data.partners.get(plan['id'], []):
+        other = get_plan(data, other_id)
+        if other:
+            related.append((
+                f"{plan['carrier']} vs {other['carrier']} 徹底比較",
+                f"compare_{pair[0]}_vs_{pair[1]}.html"
+            ))
     related.append(("格安SIM おすすめランキング", "ranking_overall.html"))
 
-    html += html_footer(related)
-    return html
+    yield html_footer(related, ctx=ctx)
+
+
+def generate_review(plan, data, ctx=None):
+    """Generate a single plan review article."""
+    return "".join(iter_review(plan, data, ctx))
 
 
 # --- Comparison Article Generator ---
-def generate_comparison(plan_a, plan_b, data):
-    """Generate a comparison article between two plans."""
-    title = f"{plan_a['carrier']} vs {plan_b['carrier']}を徹底比較！どっちがおすすめ？【{datetime.date.today().year}年】"
+def iter_comparison(plan_a, plan_b, data, base="", ctx=None):
+    """Yield a comparison article between two plans as HTML fragments.
+
+    ``base`` is the relative path from the page back to the output directory,
+    for pages written into a shard subdirectory.
+    """
+    ctx = ctx or BuildContext()
+    title = f"{plan_a['carrier']} vs {plan_b['carrier']}を徹底比較！どっちがおすすめ？【{ctx.year}年】"
     desc = f"{plan_a['carrier']}と{plan_b['carrier']}の料金・速度・特徴を比較。あなたに合うのはどっち？"
 
-    html = html_header(title, desc)
+    yield html_header(title, desc, root=f"../{base}", ctx=ctx)
 
-    html += f"""
+    yield f"""
 <p>格安SIM選びで迷う人が多い「<strong>{plan_a['carrier']}</strong>」と「<strong>{plan_b['carrier']}</strong>」。</p>
 <p>どちらも人気のサービスですが、実はターゲットが大きく異なります。本記事では<strong>料金・データ容量・通話・サポート</strong>を一つずつ比較し、「あなたはどっちを選ぶべきか」を結論づけます。</p>
 """
 
     # Compare Table
-    html += '<h2>📊 スペック比較表</h2>'
+    yield '<h2>📊 スペック比較表</h2>'
     
     def price_compare(a, b):
         if a < b: return f'<span class="winner">{a:,}円 ✅</span>', f'{b:,}円'
@@ -207,7 +1174,7 @@ def generate_comparison(plan_a, plan_b, data):
     
     pa, pb = price_compare(plan_a['monthly_price'], plan_b['monthly_price'])
 
-    html += f"""
+    yield f"""
 <table class="compare-table">
   <tr><th>比較項目</th><th>{plan_a['carrier']}</th><th>{plan_b['carrier']}</th></tr>
   <tr><td>月額料金</td><td>{pa}</td><td>{pb}</td></tr>
@@ -221,29 +1188,63 @@ def generate_comparison(plan_a, plan_b, data):
 """
 
     # Analysis
-    html += '<h2>🔍 各項目を詳しく比較</h2>'
+    yield '<h2>🔍 各項目を詳しく比較</h2>'
     
     # Price
-    html += '<h3>💰 料金の比較</h3>'
-    if plan_a['monthly_price'] < plan_b['monthly_price']:
-        diff = plan_b['monthly_price'] - plan_a['monthly_price']
-        html += f'<p>月額料金は<strong>{plan_a["carrier"]}が{diff:,}円安い</strong>です。年間で{diff * 12:,}円の差になります。安さ重視なら{plan_a["carrier"]}が有利です。</p>'
-    elif plan_b['monthly_price'] < plan_a['monthly_price']:
-        diff = plan_a['monthly_price'] - plan_b['monthly_price']
-        html += f'<p>月額料金は<strong>{plan_b["carrier"]}が{diff:,}円安い</strong>です。年間で{diff * 12:,}円の差になります。安さ重視なら{plan_b["carrier"]}が有利です。</p>'
+    yield '<h3>💰 料金の比較</h3>'
+    # Same usage as the first-year total below, so the verdicts agree
+    profile = COMPARISON_PROFILES[1]
+    usage = usage_label(profile)
+    ma = data.costs.monthly_cost(plan_a['id'], profile)
+    mb = data.costs.monthly_cost(plan_b['id'], profile)
+    if ma is None and mb is None:
+        yield f'<p>{usage}の使い方には、どちらのプランも対応していません。</p>'
+    elif ma is None or mb is None:
+        covered = plan_b if ma is None else plan_a
+        yield f'<p>{usage}の使い方に対応できるのは<strong>{covered["carrier"]}だけ</strong>です。</p>'
+    elif ma != mb:
+        cheaper, diff = (plan_a, mb - ma) if ma < mb else (plan_b, ma - mb)
+        yield (f'<p>{usage}の実質月額は<strong>{cheaper["carrier"]}が{diff:,}円安い</strong>です。'
+               f'年間で{diff * 12:,}円の差になります。安さ重視なら{cheaper["carrier"]}が有利です。</p>')
     else:
-        html += f'<p>月額料金は<strong>同額</strong>です。料金以外の要素で選びましょう。</p>'
+        yield f'<p>{usage}の実質月額は<strong>同額</strong>です。料金以外の要素で選びましょう。</p>'
 
     # Data
-    html += '<h3>📶 データ容量の比較</h3>'
+    yield '<h3>📶 データ容量の比較</h3>'
     if plan_a['data_gb'] > plan_b['data_gb']:
-        html += f'<p>基本プランのデータ容量は{plan_a["carrier"]}（{plan_a["data_gb"]}GB）が{plan_b["carrier"]}（{plan_b["data_gb"]}GB）より多いです。</p>'
+        yield f'<p>基本プランのデータ容量は{plan_a["carrier"]}（{plan_a["data_gb"]}GB）が{plan_b["carrier"]}（{plan_b["data_gb"]}GB）より多いです。</p>'
     elif plan_b['data_gb'] > plan_a['data_gb']:
-        html += f'<p>基本プランのデータ容量は{plan_b["carrier"]}（{plan_b["data_gb"]}GB）が{plan_a["carrier"]}（{plan_a["data_gb"]}GB）より多いです。</p>'
+        yield f'<p>基本プランのデータ容量は{plan_b["carrier"]}（{plan_b["data_gb"]}GB）が{plan_a["carrier"]}（{plan_a["data_gb"]}GB）より多いです。</p>'
+
+    # Effective cost by usage
+    yield '<h3>💡 使い方別の実質料金</h3>'
+    yield f'<p>通話料と、初期費用を{AMORTIZE_MONTHS}か月で割った分を含めた実質の月額です（家族は全員分の合計）。</p>'
+    yield f"""
+<table class="compare-table">
+  <tr><th>使い方</th><th>{plan_a['carrier']}</th><th>{plan_b['carrier']}</th></tr>
+"""
+    costs = data.costs
+    for profile in COMPARISON_PROFILES:
+        ca = costs.monthly_cost(plan_a['id'], profile)
+        cb = costs.monthly_cost(plan_b['id'], profile)
+        if ca is not None and cb is not None:
+            ta, tb = price_compare(ca, cb)
+        else:
+            ta = "対応プランなし" if ca is None else f"{ca:,}円"
+            tb = "対応プランなし" if cb is None else f"{cb:,}円"
+        yield f"  <tr><td>{usage_label(profile)}</td><td>{ta}</td><td>{tb}</td></tr>\n"
+    yield "</table>\n"
+
+    profile = COMPARISON_PROFILES[1]
+    ya = costs.annual_cost(plan_a['id'], profile)
+    yb = costs.annual_cost(plan_b['id'], profile)
+    if ya is not None and yb is not None and ya != yb:
+        cheaper, diff = (plan_a, yb - ya) if ya < yb else (plan_b, ya - yb)
+        yield f'<p>{usage_label(profile)}なら、初期費用込みの1年目の総額は<strong>{cheaper["carrier"]}が{diff:,}円お得</strong>です。</p>'
 
     # Verdict
-    html += '<h2>🏆 結論：どっちを選ぶべき？</h2>'
-    html += f"""
+    yield '<h2>🏆 結論：どっちを選ぶべき？</h2>'
+    yield f"""
 <div class="verdict-box">
   <h3 style="color:var(--primary);border:none">{plan_a['carrier']}がおすすめな人</h3>
   <p>{plan_a['best_for']}</p>
@@ -255,33 +1256,38 @@ def generate_comparison(plan_a, plan_b, data):
 """
 
     # CTAs
-    html += make_cta_html(plan_a)
-    html += make_cta_html(plan_b)
+    yield ctx.cta(plan_a)
+    yield ctx.cta(plan_b)
     
     related = [
-        (f"{plan_a['carrier']}の詳細レビュー", f"review_{plan_a['id']}.html"),
-        (f"{plan_b['carrier']}の詳細レビュー", f"review_{plan_b['id']}.html"),
-        ("格安SIM おすすめランキング", "ranking_overall.html"),
+        (f"{plan_a['carrier']}の詳細レビュー", f"{base}review_{plan_a['id']}.html"),
+        (f"{plan_b['carrier']}の詳細レビュー", f"{base}review_{plan_b['id']}.html"),
+        ("格安SIM おすすめランキング", f"{base}ranking_overall.html"),
     ]
 
-    html += html_footer(related)
-    return html
+    yield html_footer(related, ctx=ctx)
+
+
+def generate_comparison(plan_a, plan_b, data, base="", ctx=None):
+    """Generate a comparison article between two plans."""
+    return "".join(iter_comparison(plan_a, plan_b, data, base, ctx))
 
 
 # --- Ranking Article Generator ---
-def generate_ranking(ranking_def, data):
-    """Generate a ranking article."""
-    title = f"{ranking_def['title']}【{datetime.date.today().year}年最新版】"
+def iter_ranking(ranking_def, data, ctx=None):
+    """Yield a ranking article as HTML fragments."""
+    ctx = ctx or BuildContext()
+    title = f"{ranking_def['title']}【{ctx.year}年最新版】"
     desc = ranking_def['description']
 
-    html = html_header(title, desc)
+    yield html_header(title, desc, ctx=ctx)
 
-    html += f"""
+    yield f"""
 <p>{ranking_def['description']}</p>
 <p>本ランキングは<strong>料金・通信品質・サポート・独自機能</strong>を総合的に評価し、本当におすすめできる格安SIMだけを厳選しました。</p>
 """
 
-    html += '<h2>🏆 ランキング</h2>'
+    yield '<h2>🏆 ランキング</h2>'
 
     for i, plan_id in enumerate(ranking_def['ranking_order']):
         plan = get_plan(data, plan_id)
@@ -292,7 +1298,7 @@ def generate_ranking(ranking_def, data):
         rank_label = "🥇" if rank == 1 else "🥈" if rank == 2 else "🥉" if rank == 3 else f"{rank}位"
         rank_class = f"rank-{rank}" if rank <= 3 else ""
 
-        html += f"""
+        yield f"""
 <div class="plan-card">
   <div class="plan-card-header {rank_class}">
     <span class="rank-badge">{rank_label}</span>
@@ -308,32 +1314,29 @@ def generate_ranking(ranking_def, data):
       <span class="price-unit">円/月〜</span>
     </div>
     <div class="feature-tags">"""
-        for feat in plan['features'][:3]:
-            html += f'<span class="feature-tag">✅ {feat.split("（")[0][:20]}</span>'
-        html += """</div>
-    <p style="margin-top:12px"><strong>こんな人におすすめ：</strong>""" + plan['best_for'] + """</p>"""
-        
-        html += make_cta_html(plan, label=f"{plan['carrier']}を申し込む", sub_text="※ 公式サイトへ移動します")
-        html += f"""
-    <p style="text-align:center"><a href="review_{plan['id']}.html">→ {plan['carrier']}の詳細レビューを読む</a></p>
-  </div>
-</div>
-"""
+        yield plan_fragment('ranking_card_pitch', plan, ranking_card_pitch_html)
+        yield ctx.cta(*ranking_cta_args(plan))
+        yield plan_fragment('ranking_card_tail', plan, ranking_card_tail_html)
+
+    yield html_footer(ctx=ctx)
 
-    html += html_footer()
-    return html
+
+def generate_ranking(ranking_def, data, ctx=None):
+    """Generate a ranking article."""
+    return "".join(iter_ranking(ranking_def, data, ctx))
 
 
 # --- Guide Article: 格安SIMとは ---
-def generate_guide(data):
-    """Generate the beginner guide article explaining what 格安SIM is."""
-    year = datetime.date.today().year
+def iter_guide(data, ctx=None):
+    """Yield the beginner guide article explaining what 格安SIM is as HTML fragments."""
+    ctx = ctx or BuildContext()
+    year = ctx.year
     title = f"格安SIMとは？大手キャリアとの違い・メリット・デメリットを初心者向けに解説【{year}年】"
     desc = "格安SIMとは何か？ドコモ・au・ソフトバンクとの違い、メリット・デメリットを初心者にもわかりやすく解説します。"
 
-    html = html_header(title, desc)
+    yield html_header(title, desc, ctx=ctx)
 
-    html += """
+    yield """
 <p>「<strong>格安SIM</strong>」という言葉を聞いたことはあるけれど、<strong>実際に何が違うのか、本当に安くなるのか</strong>不安な方も多いのではないでしょうか。</p>
 <p>この記事では、格安SIMの仕組みから大手キャリア（ドコモ・au・ソフトバンク）との違い、乗り換えるメリット・デメリットまで<strong>初心者向けにわかりやすく</strong>解説します。</p>
 
@@ -416,7 +1419,7 @@ def generate_guide(data):
 """
 
     # CTA to ranking
-    html += """
+    yield """
 <a href="ranking_overall.html" class="cta-button">
   おすすめ格安SIMランキングを見る
   <span class="sub-text">→ あなたにぴったりの格安SIMを探す</span>
@@ -429,24 +1432,146 @@ def generate_guide(data):
         ("格安SIM 全プラン比較表", "hikaku_table.html"),
     ]
 
-    html += html_footer(related)
-    return html
+    yield html_footer(related, ctx=ctx)
+
+
+def generate_guide(data, ctx=None):
+    """Generate the beginner guide article explaining what 格安SIM is."""
+    return "".join(iter_guide(data, ctx))
+
+
+# --- Plan Data File ---
+# Columns of output/plans.json, which the comparison table sorts in the browser
+PLAN_JSON_FIELDS = ('id', 'carrier', 'parent', 'logo_emoji', 'monthly_price', 'data_gb',
+                    'data_gb_large', 'initial_cost', 'network_short', 'esim')
+
+
+def iter_plan_json(data):
+    """Yield the compact plan data file: field names once, then one row per plan."""
+    yield '{"fields":' + json.dumps(PLAN_JSON_FIELDS, separators=(',', ':')) + ',"rows":[\n'
+    for i, plan in enumerate(data['sim_plans']):
+        row = json.dumps([plan[field] for field in PLAN_JSON_FIELDS], ensure_ascii=False,
+                         separators=(',', ':'))
+        yield (",\n" if i else "") + row
+    yield "\n]}\n"
+
+
+def iter_search_index(data):
+    """Yield the prebuilt site search index, one row per plan.
+
+    ``features`` is a bitmask over FEATURE_FLAGS and ``text`` is the lowercased
+    string a search box matches against.
+    """
+    flags = list(FEATURE_FLAGS)
+    fields = ['id', 'carrier', 'parent', 'network', 'price', 'data_gb', 'features', 'url', 'text']
+    yield ('{"features":' + json.dumps(flags, separators=(',', ':'))
+           + ',"fields":' + json.dumps(fields, separators=(',', ':')) + ',"rows":[\n')
+    for i, plan in enumerate(data['sim_plans']):
+        mask = sum(1 << bit for bit, flag in enumerate(flags) if plan[flag])
+        text = " ".join([plan['carrier'], plan['parent'], plan['network_short'],
+                         *(FEATURE_FLAGS[flag] for flag in flags if plan[flag])]).lower()
+        row = [plan['id'], plan['carrier'], plan['parent'], plan['network_short'], plan['monthly_price'],
+               plan['data_gb'], mask, f"review_{plan['id']}.html", text]
+        yield (",\n" if i else "") + json.dumps(row, ensure_ascii=False, separators=(',', ':'))
+    yield "\n]}\n"
+
+
+# Generators of the JSON files written next to the pages, by page id
+DATA_FILES = {
+    'plans': ("plans.json", iter_plan_json),
+    'search': ("search_index.json", iter_search_index),
+}
+
+
+PLAN_LIST_SCRIPT = """<script>
+(function () {
+  var box = document.getElementById('plan-list');
+  var more = document.getElementById('plan-list-more');
+  var select = document.getElementById('plan-sort');
+  var step = Number(box.dataset.step);
+  var orders = {
+    price: function (a, b) { return a.monthly_price - b.monthly_price; },
+    data: function (a, b) { return (b.data_gb_large === -1) - (a.data_gb_large === -1) || b.data_gb - a.data_gb; },
+    initial: function (a, b) { return a.initial_cost - b.initial_cost; }
+  };
+  var plans = [], sorted = [], shown = 0;
+
+  function yen(n) { return n.toLocaleString('ja-JP') + '円'; }
+
+  function card(p, rank) {
+    return '<div class="plan-card" style="margin:12px 0">' +
+      '<div class="plan-card-body" style="padding:16px 24px;display:flex;align-items:center;justify-content:space-between;flex-wrap:wrap;gap:12px">' +
+      '<div style="display:flex;align-items:center;gap:12px">' +
+      '<span style="font-size:1.3rem;font-weight:900;color:var(--text-muted);min-width:36px">' + rank + '位</span>' +
+      '<div><strong style="font-size:1.1rem">' + p.logo_emoji + ' ' + p.carrier + '</strong>' +
+      '<span style="color:var(--text-muted);font-size:0.85rem;margin-left:8px">' + p.parent + '</span></div></div>' +
+      '<div style="display:flex;align-items:center;gap:16px">' +
+      '<span style="font-size:1.4rem;font-weight:900;color:var(--accent-blue)">' + (p.monthly_price > 0 ? yen(p.monthly_price) : '0円〜') + '</span>' +
+      '<span style="color:var(--text-muted);font-size:0.85rem">/ ' + p.data_gb + 'GB</span>' +
+      '<a href="review_' + p.id + '.html" style="font-weight:700;font-size:0.85rem">詳細→</a>' +
+      '</div></div></div>';
+  }
+
+  function showMore() {
+    var html = '';
+    for (var end = Math.min(shown + step, sorted.length); shown < end; shown++) {
+      html += card(sorted[shown], shown + 1);
+    }
+    box.insertAdjacentHTML('beforeend', html);
+    more.hidden = shown >= sorted.length;
+  }
+
+  function sortBy(key) {
+    sorted = plans.slice().sort(orders[key]);
+    shown = 0;
+    box.innerHTML = '';
+    showMore();
+  }
+
+  fetch(box.dataset.src).then(function (res) { return res.json(); }).then(function (json) {
+    plans = json.rows.map(function (row) {
+      var p = {};
+      json.fields.forEach(function (f, i) { p[f] = row[i]; });
+      return p;
+    });
+    sortBy(select.value);
+  }).catch(function () {
+    box.innerHTML = '<p>一覧を読み込めませんでした。上の比較表をご覧ください。</p>';
+  });
+  select.addEventListener('change', function () { sortBy(select.value); });
+  more.addEventListener('click', showMore);
+})();
+</script>"""
 
 
 # --- Full Comparison Table Generator ---
-def generate_comparison_table(data):
-    """Generate a full comparison table of all SIM plans."""
-    year = datetime.date.today().year
+def table_page_name(page_no):
+    return "hikaku_table.html" if page_no == 1 else f"hikaku_table_{page_no}.html"
+
+
+def iter_comparison_table(data, page_no=1, page_count=1, ctx=None):
+    """Yield one page of the comparison table of all SIM plans as HTML fragments.
+
+    Each page covers TABLE_PAGE_SIZE plans; the first page also lists every
+    plan by price, sorted in the browser from plans.json.
+    """
+    ctx = ctx or BuildContext()
+    year = ctx.year
     plans = data['sim_plans']
-    title = f"格安SIM 全{len(plans)}社 比較表【{year}年最新】料金・データ容量・特徴を一覧で比較"
+    page_plans = plans[(page_no - 1) * TABLE_PAGE_SIZE:page_no * TABLE_PAGE_SIZE]
+    page_label = f"（{page_no}/{page_count}ページ）" if page_count > 1 else ""
+    title = f"格安SIM 全{len(plans)}社 比較表{page_label}【{year}年最新】料金・データ容量・特徴を一覧で比較"
     desc = f"主要格安SIM {len(plans)}社の料金・データ容量・通信速度・特徴を一覧表で比較。ひと目でわかる比較表で最適な格安SIMが見つかります。"
 
-    html = html_header(title, desc)
+    yield html_header(title, desc, ctx=ctx)
 
-    html += f"""
+    yield f"""
 <p>「結局どの格安SIMが自分に合っているの？」という方のために、主要<strong>{len(plans)}社の格安SIMを一覧表</strong>で比較しました。</p>
 <p>まずは料金やデータ量をざっと見比べて、気になるサービスの詳細レビューへ進んでください。</p>
-
+"""
+    if data.price_changes:
+        yield '<p>📈 最近の料金改定は<a href="price_changes.html">料金改定情報</a>にまとめています。</p>\n'
+    yield """
 <h2>📊 格安SIM 比較一覧表</h2>
 <div style="overflow-x:auto; margin: 24px 0;">
 <table class="compare-table" style="min-width:800px;">
@@ -462,7 +1587,7 @@ def generate_comparison_table(data):
   </tr>
 """
 
-    for plan in plans:
+    for plan in page_plans:
         data_text = f"{plan['data_gb']}GB"
         if plan['data_gb_large'] == -1:
             data_text += " 〜 無制限"
@@ -473,57 +1598,45 @@ def generate_comparison_table(data):
         initial = "無料" if plan['initial_cost'] == 0 else f"{plan['initial_cost']:,}円"
         esim = "✅" if plan['esim'] else "❌"
 
-        html += f"""  <tr>
+        yield f"""  <tr>
     <td><strong>{plan['logo_emoji']} {plan['carrier']}</strong><br><span style="font-size:0.75rem;color:var(--text-muted)">{plan['parent']}</span></td>
-    <td><strong style="color:var(--accent-blue)">{price_text}</strong></td>
+    <td><strong style="color:var(--accent-blue)">{price_text}</strong>{price_badge(data, plan['id'], ctx)}</td>
     <td>{data_text}</td>
-    <td>{plan['network'].split(' ')[0]}</td>
-    <td style="font-size:0.8rem">{plan['call_included'][:15]}...</td>
+    <td>{plan['network_short']}</td>
+    <td style="font-size:0.8rem">{plan['call_short']}...</td>
     <td>{esim}</td>
     <td>{initial}</td>
     <td><a href="review_{plan['id']}.html" style="font-weight:700">詳細→</a></td>
   </tr>
 """
 
-    html += """</table>
+    yield """</table>
 </div>
 """
 
-    # Price sort section
-    sorted_by_price = sorted(plans, key=lambda p: p['monthly_price'])
-    html += """
+    if page_no == 1:
+        yield f"""
 <h2>💰 月額料金が安い順</h2>
 <p>最安プランの月額料金順に並べると、以下のようになります。</p>
-"""
-    for i, plan in enumerate(sorted_by_price):
-        rank = i + 1
-        price = f"{plan['monthly_price']:,}円" if plan['monthly_price'] > 0 else "0円〜"
-        html += f"""
-<div class="plan-card" style="margin:12px 0">
-  <div class="plan-card-body" style="padding:16px 24px;display:flex;align-items:center;justify-content:space-between;flex-wrap:wrap;gap:12px">
-    <div style="display:flex;align-items:center;gap:12px">
-      <span style="font-size:1.3rem;font-weight:900;color:var(--text-muted);min-width:36px">{rank}位</span>
-      <div>
-        <strong style="font-size:1.1rem">{plan['logo_emoji']} {plan['carrier']}</strong>
-        <span style="color:var(--text-muted);font-size:0.85rem;margin-left:8px">{plan['parent']}</span>
-      </div>
-    </div>
-    <div style="display:flex;align-items:center;gap:16px">
-      <span style="font-size:1.4rem;font-weight:900;color:var(--accent-blue)">{price}</span>
-      <span style="color:var(--text-muted);font-size:0.85rem">/ {plan['data_gb']}GB</span>
-      <a href="review_{plan['id']}.html" style="font-weight:700;font-size:0.85rem">詳細→</a>
-    </div>
-  </div>
+<p><label>並べ替え: <select id="plan-sort">
+  <option value="price">月額料金が安い順</option>
+  <option value="data">データ容量が多い順</option>
+  <option value="initial">初期費用が安い順</option>
+</select></label></p>
+<div id="plan-list" data-src="plans.json" data-step="{TABLE_PAGE_SIZE}">
+<noscript><p>並べ替え一覧の表示にはJavaScriptが必要です。上の比較表をご覧ください。</p></noscript>
 </div>
+<p style="text-align:center"><button type="button" id="plan-list-more" hidden>さらに表示</button></p>
+{PLAN_LIST_SCRIPT}
 """
 
     # Data volume comparison
-    html += """
+    yield """
 <h2>📶 データ容量で比較</h2>
 <table class="compare-table">
   <tr><th>格安SIM</th><th>最安プラン</th><th>最大プラン</th><th>月額（最安）</th><th>月額（最大）</th></tr>
 """
-    for plan in plans:
+    for plan in page_plans:
         large = "無制限" if plan['data_gb_large'] == -1 else f"{plan['data_gb_large']}GB"
         large_price = "3,278円" if plan['large_plan_price'] == -1 else f"{plan['large_plan_price']:,}円" if plan['large_plan_price'] > 0 else "-"
         if plan['large_plan_price'] == -1:
@@ -532,28 +1645,35 @@ def generate_comparison_table(data):
             large_price = f"{plan['large_plan_price']:,}円"
         else:
             large_price = "-"
-        html += f"  <tr><td><strong>{plan['carrier']}</strong></td><td>{plan['data_gb']}GB</td><td>{large}</td><td>{plan['monthly_price']:,}円</td><td>{large_price}</td></tr>\n"
+        yield f"  <tr><td><strong>{plan['carrier']}</strong></td><td>{plan['data_gb']}GB</td><td>{large}</td><td>{plan['monthly_price']:,}円</td><td>{large_price}</td></tr>\n"
 
-    html += "</table>\n"
+    yield "</table>\n"
 
     # Features comparison
-    html += """
+    yield """
 <h2>🔧 機能比較</h2>
 <table class="compare-table">
   <tr><th>格安SIM</th><th>eSIM</th><th>海外利用</th><th>家族割</th><th>データ繰越</th><th>店舗サポート</th></tr>
 """
-    for plan in plans:
+    for plan in page_plans:
         esim = "✅" if plan['esim'] else "❌"
         overseas = "✅" if plan['overseas'] else "❌"
         family = "✅" if plan['family_discount'] else "❌"
-        # Infer data rollover and store support from features/cons
-        rollover = "❌" if any("繰り越し不可" in c for c in plan['cons']) else "✅"
-        store = "✅" if any("ショップ" in f or "店舗" in f or "対面" in f for f in plan['features']) else "❌"
-        html += f"  <tr><td><strong>{plan['carrier']}</strong></td><td>{esim}</td><td>{overseas}</td><td>{family}</td><td>{rollover}</td><td>{store}</td></tr>\n"
+        rollover = "✅" if plan['has_rollover'] else "❌"
+        store = "✅" if plan['has_store_support'] else "❌"
+        yield f"  <tr><td><strong>{plan['carrier']}</strong></td><td>{esim}</td><td>{overseas}</td><td>{family}</td><td>{rollover}</td><td>{store}</td></tr>\n"
+
+    yield "</table>\n"
 
-    html += "</table>\n"
+    nav = []
+    if page_no > 1:
+        nav.append(f'<a href="{table_page_name(page_no - 1)}">← 前のページ</a>')
+    if page_no < page_count:
+        nav.append(f'<a href="{table_page_name(page_no + 1)}">次のページ →</a>')
+    if nav:
+        yield f'<p class="pagination" style="text-align:center">{" ｜ ".join(nav)}</p>\n'
 
-    html += """
+    yield """
 <a href="ranking_overall.html" class="cta-button">
   おすすめ格安SIMランキングを見る
   <span class="sub-text">→ 総合評価で選ぶならこちら</span>
@@ -566,158 +1686,1573 @@ def generate_comparison_table(data):
         ("とにかく安い格安SIM ランキング", "ranking_cheapest.html"),
     ]
 
-    html += html_footer(related)
-    return html
+    yield html_footer(related, ctx=ctx)
 
 
-# --- Index Page Generator ---
-def generate_index(data):
-    """Generate the top page."""
-    today = datetime.date.today().strftime("%Y年%m月%d日")
+def generate_comparison_table(data, page_no=1, page_count=1, ctx=None):
+    """Generate one page of the comparison table of all SIM plans."""
+    return "".join(iter_comparison_table(data, page_no, page_count, ctx))
+
+
+# --- Feature Listing Generator ---
+def iter_feature_listing(flag, data, ctx=None):
+    """Yield the list of plans that have one feature flag as HTML fragments."""
+    ctx = ctx or BuildContext()
+    label = FEATURE_FLAGS[flag]
+    plans = data.by_flag[flag]
+    title = f"{label}格安SIM一覧【{ctx.year}年最新】全{len(plans)}社"
+    desc = f"{label}格安SIM {len(plans)}社を月額料金・データ容量で比較。"
+
+    yield html_header(title, desc, ctx=ctx)
+    yield f"""
+<p>{label}格安SIMは<strong>{len(plans)}社</strong>あります。月額料金の安い順に並べました。</p>
+<table class="compare-table">
+  <tr><th>格安SIM</th><th>月額料金</th><th>データ容量</th><th>詳細</th></tr>
+"""
+    for plan in sorted(plans, key=lambda p: p['monthly_price']):
+        yield (f"  <tr><td><strong>{plan['logo_emoji']} {plan['carrier']}</strong></td>"
+               f"<td>{plan['monthly_price']:,}円</td><td>{plan['data_gb']}GB</td>"
+               f"<td><a href=\"review_{plan['id']}.html\">詳細→</a></td></tr>\n")
+    yield "</table>\n"
+
+    related = [
+        ("格安SIM 全プラン比較表", "hikaku_table.html"),
+        ("格安SIM おすすめランキング", "ranking_overall.html"),
+    ]
+    yield html_footer(related, ctx=ctx)
+
+
+def generate_feature_listing(flag, data, ctx=None):
+    """Generate the list of plans that have one feature flag."""
+    return "".join(iter_feature_listing(flag, data, ctx))
+
+
+# --- Best Plan by Usage Generator ---
+def best_page_id(gb, minutes):
+    return f"{gb}gb_{minutes}min"
+
+
+def iter_best_plans(gb, minutes, data, ctx=None):
+    """Yield the cheapest plans for one usage profile as HTML fragments."""
+    ctx = ctx or BuildContext()
+    profile = (gb, minutes, 1)
+    family = (gb, minutes, USAGE_LINES[-1])
+    label = usage_label(profile)
+    title = f"{label}で一番安い格安SIMは？実質料金ランキング【{ctx.year}年】"
+    desc = f"{label}の使い方で、通話料と初期費用を含めた実質料金が安い格安SIMをランキング。"
+
+    yield html_header(title, desc, ctx=ctx)
+    yield f"""
+<p>毎月<strong>{gb}GB</strong>使い、通話は{f"月{minutes}分" if minutes else "ほとんどしない"}という人向けに、全{len(data['sim_plans'])}社の料金を試算しました。</p>
+<p>通話料（{CALL_RATE_YEN_PER_MIN}円/分）と初期費用（{AMORTIZE_MONTHS}か月で按分）を含めた<strong>実質の月額</strong>で比較しています。</p>
+<table class="compare-table">
+  <tr><th>順位</th><th>格安SIM</th><th>実質月額</th><th>1年目の総額</th><th>{USAGE_LINES[-1]}人家族の月額</th><th>詳細</th></tr>
+"""
+    costs = data.costs
+    for rank, (plan_id, monthly, annual) in enumerate(costs.cheapest(profile, BEST_PAGE_LIMIT), 1):
+        plan = get_plan(data, plan_id)
+        family_cost = costs.monthly_cost(plan_id, family)
+        family_text = "-" if family_cost is None else f"{family_cost:,}円"
+        yield (f"  <tr><td>{rank}位</td><td><strong>{plan['logo_emoji']} {plan['carrier']}</strong></td>"
+               f"<td><strong>{monthly:,}円</strong></td><td>{annual:,}円</td><td>{family_text}</td>"
+               f"<td><a href=\"review_{plan_id}.html\">詳細→</a></td></tr>\n")
+    yield "</table>\n"
+    yield "<p>※ 料金は各社の基本プランと大容量プランの2段階で試算しています。キャンペーンや割引は含みません。</p>\n"
+
+    related = [
+        ("格安SIM 全プラン比較表", "hikaku_table.html"),
+        ("とにかく安い格安SIM ランキング", "ranking_cheapest.html"),
+    ]
+    yield html_footer(related, ctx=ctx)
+
+
+def generate_best_plans(gb, minutes, data, ctx=None):
+    """Generate the cheapest plans for one usage profile."""
+    return "".join(iter_best_plans(gb, minutes, data, ctx))
+
+
+# --- Price Change Feed Generator ---
+def iter_price_changes(data, ctx=None):
+    """Yield the feed of the latest price changes as HTML fragments."""
+    ctx = ctx or BuildContext()
+    title = f"格安SIM 料金改定情報【{ctx.year}年最新】値下げ・値上げの履歴"
+    desc = "格安SIM各社の月額料金の値下げ・値上げを新しい順にまとめています。"
+
+    yield html_header(title, desc, ctx=ctx)
+    if not data.price_changes:
+        yield "<p>まだ料金の変更はありません。</p>\n"
+    else:
+        yield f"""
+<p>最近の料金改定を新しい順に{len(data.price_changes)}件まとめました。</p>
+<table class="compare-table">
+  <tr><th>改定日</th><th>格安SIM</th><th>改定前</th><th>改定後</th><th>変動</th></tr>
+"""
+        for day, plan_id, old, new in data.price_changes:
+            plan = get_plan(data, plan_id)
+            date = datetime.date.fromisoformat(day)
+            name = (f'<a href="review_{plan_id}.html">{plan["logo_emoji"]} {plan["carrier"]}</a>'
+                    if plan else plan_id)
+            change = f'<span class="winner">▼ {old - new:,}円</span>' if new < old else f"▲ {new - old:,}円"
+            yield (f"  <tr><td>{date.year}年{date.month}月{date.day}日</td><td>{name}</td>"
+                   f"<td>{old:,}円</td><td><strong>{new:,}円</strong></td><td>{change}</td></tr>\n")
+        yield "</table>\n"
+
+    related = [
+        ("格安SIM 全プラン比較表", "hikaku_table.html"),
+        ("とにかく安い格安SIM ランキング", "ranking_cheapest.html"),
+    ]
+    yield html_footer(related, ctx=ctx)
+
+
+def generate_price_changes(data, ctx=None):
+    """Generate the feed of the latest price changes."""
+    return "".join(iter_price_changes(data, ctx))
+
+
+# --- Link Listing Generator ---
+# Sections of the top page that overflow into paginated listings:
+# heading, article noun and listing description
+LIST_SECTIONS = {
+    'ranking': ("📊 ランキング記事", "ランキング記事",
+                "格安SIMのおすすめランキング記事の一覧です。目的に合ったランキングを選んでください。"),
+    'review': ("📝 個別レビュー", "レビュー記事",
+               "格安SIMの評判・メリット・デメリットをまとめたレビュー記事の一覧です。"),
+    'compare': ("⚔️ 比較記事", "比較記事",
+                "格安SIMの「どっちがおすすめ？」比較記事の一覧です。気になる組み合わせを選んでください。"),
+}
+
+
+def list_page_name(section, page_no):
+    return f"list_{section}_{page_no}.html"
+
+
+def link_sections(data):
+    """Links of every LIST_SECTIONS section as (text, href under output/, plan ids)."""
     plans = data['sim_plans']
+    compares = []
+    for pair in data.get('compare_pairs', []):
+        a = get_plan(data, pair[0])
+        b = get_plan(data, pair[1])
+        if a and b:
+            compares.append((f"{a['carrier']} vs {b['carrier']}",
+                             f"compare_{pair[0]}_vs_{pair[1]}.html", (pair[0], pair[1])))
+    return {
+        'ranking': [(r['title'], f"ranking_{r['id']}.html", ()) for r in data.get('ranking_articles', [])],
+        'review': [(f"{p['carrier']} 評判・メリット・デメリット", f"review_{p['id']}.html", (p['id'],))
+                   for p in plans],
+        'compare': compares,
+    }
 
-    html = f"""<!DOCTYPE html>
-<html lang="ja">
-<head>
-  <meta charset="UTF-8">
-  <meta name="viewport" content="width=device-width, initial-scale=1.0">
-  <title>格安SIMラボ | 格安SIM・ネット回線 比較サイト</title>
-  <meta name="description" content="格安SIMを料金・速度・サポートで徹底比較。あなたにぴったりの格安SIMが見つかります。">
-  <link rel="stylesheet" href="static/style.css">
-</head>
-<body>
-  <header class="site-header">
-    <div class="container">
-      <a href="index.html" class="site-logo">🔬 格安SIM<span>ラボ</span></a>
-      <nav class="site-nav">
-        <a href="index.html">トップ</a>
-        <a href="output/ranking_overall.html">おすすめランキング</a>
-      </nav>
-    </div>
-  </header>
-  <main class="main-content">
-    <div class="container">
-      <div class="article-header">
-        <h1>🔬 格安SIMラボ<br>あなたにベストな格安SIMを見つけよう</h1>
-        <p class="article-meta">最終更新: <time>{today}</time></p>
-      </div>
-      <div class="article-body">
+
+def iter_link_listing(section, items, page_no, page_count, ctx=None):
+    """Yield one page of a paginated link listing; items are (text, href) pairs."""
+    ctx = ctx or BuildContext()
+    heading, noun, desc = LIST_SECTIONS[section]
+    title = f"格安SIM {noun}一覧（{page_no}/{page_count}ページ）【{ctx.year}年】"
+
+    yield html_header(title, desc, ctx=ctx)
+    yield f'<h2>{heading}</h2>\n<ul>\n'
+    for text, href in items:
+        yield f'  <li><a href="{href}">{text}</a></li>\n'
+    yield '</ul>\n'
+
+    nav = []
+    if page_no > 1:
+        nav.append(f'<a href="{list_page_name(section, page_no - 1)}">← 前のページ</a>')
+    if page_no < page_count:
+        nav.append(f'<a href="{list_page_name(section, page_no + 1)}">次のページ →</a>')
+    if nav:
+        yield f'<p class="pagination" style="text-align:center">{" ｜ ".join(nav)}</p>\n'
+
+    yield html_footer([("格安SIM おすすめランキング", "ranking_overall.html")], ctx=ctx)
+
+
+def generate_link_listing(section, items, page_no, page_count, ctx=None):
+    """Generate one page of a paginated link listing."""
+    return "".join(iter_link_listing(section, items, page_no, page_count, ctx))
+
+
+# --- Index Page Generator ---
+def index_sections(links):
+    """Cut each link section down to what the top page shows: (first links, total)."""
+    return {name: ([(text, href) for text, href, _ in items[:INDEX_SECTION_LIMIT]], len(items))
+            for name, items in links.items()}
+
+
+def iter_index(data, sections=None, ctx=None):
+    """Yield the top page as HTML fragments."""
+    ctx = ctx or BuildContext()
+    plans = data['sim_plans']
+    sections = sections or index_sections(link_sections(data))
+    price_link = ""
+    if data.price_changes:
+        price_link = ('          <li><a href="output/price_changes.html"><strong>料金改定情報</strong>'
+                      ' — 最近の値下げ・値上げ</a></li>\n')
+
+    def section_links(name):
+        items, total = sections[name]
+        for text, href in items:
+            yield f'          <li><a href="output/{href}">{text}</a></li>\n'
+        if total > len(items):
+            yield (f'          <li><a href="output/{list_page_name(name, 1)}">'
+                   f'<strong>すべての{LIST_SECTIONS[name][1]}を見る（{total:,}件）</strong></a></li>\n')
+
+    yield ctx.index_header()
+    yield f"""      <div class="article-body">
         <p>当サイトでは、人気の格安SIM・モバイル通信サービスを<strong>料金・速度・サポート</strong>の観点から比較し、あなたに最適なプランをご提案します。</p>
 
         <h2>📖 はじめての方へ</h2>
         <ul>
           <li><a href="output/guide_kakuyasu.html"><strong>格安SIMとは？</strong> 大手キャリアとの違い・メリット・デメリットを解説</a></li>
           <li><a href="output/hikaku_table.html"><strong>格安SIM 全{len(plans)}社 比較表</strong> — 料金・容量・機能を一覧で比較</a></li>
-        </ul>
+{price_link}        </ul>
 
         <h2>📊 ランキング記事</h2>
         <ul>
 """
-    for r in data.get('ranking_articles', []):
-        html += f'          <li><a href="output/ranking_{r["id"]}.html">{r["title"]}</a></li>\n'
+    yield from section_links('ranking')
+
+    yield """        </ul>
+
+        <h2>🔎 機能で探す</h2>
+        <ul>
+"""
+    for flag, label in FEATURE_FLAGS.items():
+        yield f'          <li><a href="output/feature_{flag}.html">{label}格安SIM（{len(data.by_flag[flag])}社）</a></li>\n'
 
-    html += """        </ul>
+    yield """        </ul>
+
+        <h2>💴 使い方別の最安プラン</h2>
+        <ul>
+"""
+    for gb in BEST_PAGE_GB:
+        links = " ／ ".join(
+            f'<a href="output/best_{best_page_id(gb, minutes)}.html">{usage_label((gb, minutes, 1))}</a>'
+            for minutes in BEST_PAGE_CALL_MINUTES)
+        yield f'          <li>{links}</li>\n'
+
+    yield """        </ul>
 
         <h2>📝 個別レビュー</h2>
         <ul>
 """
-    for p in plans:
-        html += f'          <li><a href="output/review_{p["id"]}.html">{p["carrier"]} 評判・メリット・デメリット</a></li>\n'
+    yield from section_links('review')
 
-    html += """        </ul>
+    yield """        </ul>
 
         <h2>⚔️ 比較記事</h2>
         <ul>
 """
-    for pair in data.get('compare_pairs', []):
-        a = get_plan(data, pair[0])
-        b = get_plan(data, pair[1])
-        if a and b:
-            html += f'          <li><a href="output/compare_{pair[0]}_vs_{pair[1]}.html">{a["carrier"]} vs {b["carrier"]}</a></li>\n'
+    yield from section_links('compare')
 
-    html += f"""        </ul>
-      </div>
-    </div>
-  </main>
-  <footer class="site-footer">
-    <div class="container">
-      <p>&copy; {datetime.date.today().year} 格安SIMラボ</p>
-      <p class="disclaimer">※ 当サイトはアフィリエイトプログラムに参加しています。</p>
-    </div>
-  </footer>
-</body>
-</html>"""
+    yield """        </ul>
+"""
+    yield ctx.index_footer()
+
+
+def generate_index(data, sections=None, ctx=None):
+    """Generate the top page."""
+    return "".join(iter_index(data, sections, ctx))
+
+
+# --- All-Pairs Comparisons ---
+def price_band(plan):
+    return bisect.bisect_right(PRICE_BANDS, plan['monthly_price'])
+
+
+PAIR_FILTERS = {
+    'all': lambda a, b: True,
+    'price-band': lambda a, b: price_band(a) == price_band(b),
+    'parent': lambda a, b: a['parent'] == b['parent'],
+}
+
+
+def iter_all_pairs(data, pair_filter='all'):
+    """Yield every plan pair matching the filter that is not already curated."""
+    curated = {frozenset(pair) for pair in data.get('compare_pairs', [])}
+    accept = PAIR_FILTERS[pair_filter]
+    for plan_a, plan_b in itertools.combinations(data['sim_plans'], 2):
+        if frozenset((plan_a['id'], plan_b['id'])) not in curated and accept(plan_a, plan_b):
+            yield plan_a, plan_b
+
+
+def pair_shard(pair_id):
+    return hashlib.sha1(pair_id.encode('utf-8')).hexdigest()[:2]
+
+
+# --- Page Enumeration ---
+def enumerate_pages(data, pair_filter=None):
+    """List every page of the site, in build order.
+
+    With ``pair_filter`` set, a comparison page is also generated for every
+    matching plan pair. Sections of the top page longer than
+    INDEX_SECTION_LIMIT get a paginated listing of every link.
+    """
+    return list(iter_pages(data, pair_filter))
+
+
+def iter_pages(data, pair_filter=None, kinds=None):
+    """Yield the pages of the site in build order, limited to ``kinds`` if given.
+
+    Page families outside ``kinds`` are never enumerated, and the all-pairs
+    list and the link sections are only worked out when a wanted family
+    needs them, so selecting a few reviews costs a few dicts.
+    """
+    def wanted(kind):
+        return kinds is None or kind in kinds
+
+    @functools.cache
+    def all_pairs():
+        if pair_filter is None:
+            return []
+        return [(plan_a, plan_b, f"{plan_a['id']}_vs_{plan_b['id']}")
+                for plan_a, plan_b in iter_all_pairs(data, pair_filter)]
+
+    @functools.cache
+    def links():
+        links = link_sections(data)
+        for plan_a, plan_b, pair_id in all_pairs():
+            links['compare'].append((f"{plan_a['carrier']} vs {plan_b['carrier']}",
+                                     f"pairs/{pair_shard(pair_id)}/compare_{pair_id}.html",
+                                     (plan_a['id'], plan_b['id'])))
+        return links
+
+    all_ids = tuple(p['id'] for p in data['sim_plans'])
+    if wanted('review'):
+        for plan in data['sim_plans']:
+            partners = [other_id for other_id, _ in data.partners.get(plan['id'], [])]
+            yield {
+                'key': f"review:{plan['id']}",
+                'kind': 'review',
+                'id': plan['id'],
+                'path': OUTPUT_DIR / f"review_{plan['id']}.html",
+                'label': f"レビュー: {plan['carrier']}",
+                'deps': (plan['id'], *partners),
+            }
+    if wanted('compare'):
+        for pair in data.get('compare_pairs', []):
+            plan_a = get_plan(data, pair[0])
+            plan_b = get_plan(data, pair[1])
+            if plan_a and plan_b:
+                yield {
+                    'key': f"compare:{pair[0]}_vs_{pair[1]}",
+                    'kind': 'compare',
+                    'id': f"{pair[0]}_vs_{pair[1]}",
+                    'pair': (pair[0], pair[1]),
+                    'path': OUTPUT_DIR / f"compare_{pair[0]}_vs_{pair[1]}.html",
+                    'label': f"比較: {plan_a['carrier']} vs {plan_b['carrier']}",
+                    'deps': (pair[0], pair[1]),
+                }
+        for plan_a, plan_b, pair_id in all_pairs():
+            yield {
+                'key': f"compare:{pair_id}",
+                'kind': 'compare',
+                'id': pair_id,
+                'pair': (plan_a['id'], plan_b['id']),
+                'base': "../../",
+                'path': PAIRS_DIR / pair_shard(pair_id) / f"compare_{pair_id}.html",
+                'label': f"比較: {plan_a['carrier']} vs {plan_b['carrier']}",
+                'deps': (plan_a['id'], plan_b['id']),
+            }
+    if wanted('ranking'):
+        for ranking in data.get('ranking_articles', []):
+            yield {
+                'key': f"ranking:{ranking['id']}",
+                'kind': 'ranking',
+                'id': ranking['id'],
+                'path': OUTPUT_DIR / f"ranking_{ranking['id']}.html",
+                'label': f"ランキング: {ranking['title']}",
+                # Scores are scaled over every plan and variants regroup them,
+                # so any plan can move a score-based ranking
+                'deps': all_ids if 'weights' in ranking else tuple(ranking['ranking_order']),
+            }
+    if wanted('feature'):
+        for flag, label in FEATURE_FLAGS.items():
+            yield {
+                'key': f"feature:{flag}",
+                'kind': 'feature',
+                'id': flag,
+                'path': OUTPUT_DIR / f"feature_{flag}.html",
+                'label': f"機能別一覧: {label}",
+                'deps': all_ids,
+            }
+    if wanted('best'):
+        for gb in BEST_PAGE_GB:
+            for minutes in BEST_PAGE_CALL_MINUTES:
+                page_id = best_page_id(gb, minutes)
+                yield {
+                    'key': f"best:{page_id}",
+                    'kind': 'best',
+                    'id': page_id,
+                    'usage': (gb, minutes),
+                    'path': OUTPUT_DIR / f"best_{page_id}.html",
+                    'label': f"使い方別: {usage_label((gb, minutes, 1))}",
+                    'deps': all_ids,
+                }
+    # Listing pages come last so they are rebuilt after the pages they link to
+    if wanted('list'):
+        for section, items in links().items():
+            if len(items) <= INDEX_SECTION_LIMIT:
+                continue
+            page_count = -(-len(items) // LIST_PAGE_SIZE)
+            for page_no in range(1, page_count + 1):
+                chunk = items[(page_no - 1) * LIST_PAGE_SIZE:page_no * LIST_PAGE_SIZE]
+                yield {
+                    'key': f"list:{section}_{page_no}",
+                    'kind': 'list',
+                    'id': f"{section}_{page_no}",
+                    'section': section,
+                    'items': [(text, href) for text, href, _ in chunk],
+                    'page_no': page_no,
+                    'page_count': page_count,
+                    'path': OUTPUT_DIR / list_page_name(section, page_no),
+                    'label': f"{LIST_SECTIONS[section][1]}一覧: {page_no}/{page_count}",
+                    'deps': tuple(dict.fromkeys(plan_id for _, _, ids in chunk for plan_id in ids)),
+                }
+    # Only linked from the site once there is something to show
+    if wanted('feed') and data.price_changes:
+        yield {'key': "feed:price_changes", 'kind': 'feed', 'id': "price_changes",
+               'path': OUTPUT_DIR / "price_changes.html", 'label': "料金改定情報",
+               'deps': all_ids}
+    if wanted('guide'):
+        yield {'key': "guide:kakuyasu", 'kind': 'guide', 'id': "kakuyasu",
+               'path': OUTPUT_DIR / "guide_kakuyasu.html", 'label': "ガイド: 格安SIMとは？",
+               'deps': ()}
+    if wanted('table'):
+        table_pages = max(1, -(-len(all_ids) // TABLE_PAGE_SIZE))
+        for page_no in range(1, table_pages + 1):
+            suffix = "" if page_no == 1 else f"_{page_no}"
+            yield {'key': f"table:hikaku{suffix}", 'kind': 'table', 'id': f"hikaku{suffix}",
+                   'page_no': page_no, 'page_count': table_pages,
+                   'path': OUTPUT_DIR / table_page_name(page_no),
+                   'label': f"比較表: 全プラン比較表 {page_no}/{table_pages}",
+                   'deps': all_ids}
+    if wanted('data'):
+        for file_id, (name, _) in DATA_FILES.items():
+            yield {'key': f"data:{file_id}", 'kind': 'data', 'id': file_id,
+                   'path': OUTPUT_DIR / name, 'label': f"データ: {name}",
+                   'deps': all_ids}
+    if wanted('index'):
+        yield {'key': "index:top", 'kind': 'index', 'id': "top",
+               'path': BASE_DIR / "index.html", 'label': "トップページ",
+               'sections': index_sections(links()),
+               'deps': all_ids}
+
+
+PAGE_KINDS = ('review', 'compare', 'ranking', 'feature', 'best', 'list', 'feed', 'guide', 'table', 'data', 'index')
+
+
+def parse_page_selection(spec):
+    """Parse --only's "kind:id-glob,..." into [(kind, id glob)].
+
+    The kind may itself be a glob and a bare kind means every page of it.
+    Raises ValueError for a pattern that matches no page kind.
+    """
+    selection = []
+    for pattern in filter(None, (part.strip() for part in spec.split(','))):
+        kind, _, id_glob = pattern.partition(':')
+        kinds = fnmatch.filter(PAGE_KINDS, kind)
+        if not kinds:
+            raise ValueError(f"不明なページ種別: {kind}（{', '.join(PAGE_KINDS)}）")
+        selection.extend((k, id_glob or '*') for k in kinds)
+    return selection
+
+
+def select_pages(data, selection, pair_filter=None):
+    """Yield the pages matching a parse_page_selection() result, in build order."""
+    globs = {}
+    for kind, id_glob in selection:
+        globs.setdefault(kind, []).append(id_glob)
+    for page in iter_pages(data, pair_filter, globs.keys()):
+        if any(fnmatch.fnmatchcase(page['id'], id_glob) for id_glob in globs[page['kind']]):
+            yield page
+
+
+def get_ranking(data, ranking_id):
+    return data.rankings.get(ranking_id)
+
+
+# --- Dependency Graph ---
+def dependency_graph(pages):
+    """Map each plan id to the pages that read it, in build order."""
+    graph = {}
+    for page in pages:
+        for plan_id in dict.fromkeys(page['deps']):
+            graph.setdefault(plan_id, []).append(page)
+    return graph
+
+
+def diff_catalogues(old, new):
+    """Return the plan ids and ranking ids that differ between two catalogues."""
+    changed = {pid for pid in old.by_id.keys() | new.by_id.keys()
+               if old.by_id.get(pid) != new.by_id.get(pid)}
+
+    # Adding or removing a pair changes the related links of both plans
+    old_pairs = {tuple(pair) for pair in old.get('compare_pairs', [])}
+    new_pairs = {tuple(pair) for pair in new.get('compare_pairs', [])}
+    for pair in old_pairs ^ new_pairs:
+        changed.update(pair)
+
+    changed_rankings = {rid for rid in old.rankings.keys() | new.rankings.keys()
+                        if old.rankings.get(rid) != new.rankings.get(rid)}
+    return changed, changed_rankings
+
+
+def affected_pages(pages, changed_plans, changed_rankings=()):
+    """Select the pages that read any changed plan or ranking, in build order."""
+    graph = dependency_graph(pages)
+    keys = {page['key'] for plan_id in changed_plans for page in graph.get(plan_id, [])}
+    keys.update(f"ranking:{rid}" for rid in changed_rankings)
+    if changed_rankings:
+        keys.add("index:top")
+        keys.update(page['key'] for page in pages if page.get('section') == 'ranking')
+    return [page for page in pages if page['key'] in keys]
+
+
+def iter_page(page, data, ctx=None):
+    """Return an iterator over the HTML fragments of one enumerated page."""
+    kind = page['kind']
+    if kind == 'review':
+        return iter_review(get_plan(data, page['id']), data, ctx=ctx)
+    if kind == 'compare':
+        return iter_comparison(get_plan(data, page['pair'][0]), get_plan(data, page['pair'][1]), data,
+                               page.get('base', ""), ctx=ctx)
+    if kind == 'list':
+        return iter_link_listing(page['section'], page['items'], page['page_no'], page['page_count'], ctx=ctx)
+    if kind == 'ranking':
+        return iter_ranking(get_ranking(data, page['id']), data, ctx=ctx)
+    if kind == 'feature':
+        return iter_feature_listing(page['id'], data, ctx=ctx)
+    if kind == 'best':
+        return iter_best_plans(*page['usage'], data, ctx=ctx)
+    if kind == 'feed':
+        return iter_price_changes(data, ctx=ctx)
+    if kind == 'guide':
+        return iter_guide(data, ctx=ctx)
+    if kind == 'table':
+        return iter_comparison_table(data, page['page_no'], page['page_count'], ctx=ctx)
+    if kind == 'data':
+        return DATA_FILES[page['id']][1](data)
+    if kind == 'index':
+        return iter_index(data, page['sections'], ctx=ctx)
+    raise ValueError(f"unknown page kind: {kind}")
+
+
+def render_page(page, data, ctx=None):
+    """Render one enumerated page to HTML."""
+    return "".join(iter_page(page, data, ctx))
+
+
+# --- Page Writer ---
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            h.update(block)
+    return h.digest()
+
+
+def write_if_changed(path, fragments):
+    """Stream fragments to a temp file and move it over ``path`` only if different.
+
+    Identical files are left untouched, so their mtime does not change and
+    deploy syncs skip them. Returns (changed, bytes, seconds spent on I/O).
+    """
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    h = hashlib.sha256()
+    size = 0
+    io_seconds = 0.0
+    clock = time.perf_counter
+    try:
+        t0 = clock()
+        with open(tmp, 'wb') as f:
+            io_seconds += clock() - t0
+            for fragment in fragments:
+                chunk = fragment.encode('utf-8')
+                h.update(chunk)
+                size += len(chunk)
+                t0 = clock()
+                f.write(chunk)
+                io_seconds += clock() - t0
+            t0 = clock()
+        changed = replace_if_changed(tmp, path, size, h.digest())
+        io_seconds += clock() - t0
+        return changed, size, io_seconds
+    except BaseException:
+        if tmp.exists():
+            os.unlink(tmp)
+        raise
+
+
+def replace_if_changed(tmp, path, size, digest):
+    """Move a finished temp file over ``path`` unless the content is identical."""
+    changed = not (path.exists() and path.stat().st_size == size and file_digest(path) == digest)
+    if changed:
+        os.replace(tmp, path)
+    else:
+        os.unlink(tmp)
+    return changed
+
+
+def write_page(page, data, ctx):
+    """Stream a page's fragments into its output file and time it.
+
+    With site variants the page body is rendered once through a
+    SlotContext and every site, the main one included, only fills in its
+    own header, footer and CTAs before writing its copy.
+    """
+    t0 = time.perf_counter()
+    hits, misses = FRAGMENTS.hits, FRAGMENTS.misses
+    links = set()
+    rel_path = page['path'].relative_to(BASE_DIR)
+    minify = ctx.minify and page['path'].suffix == '.html'
+    if ctx.variants:
+        body = list(iter_page(page, data, ctx.slots()))
+        fragments = fill_slots(body, ctx)
+    else:
+        fragments = iter_page(page, data, ctx)
+    fragments = collect_links(fragments, links, rel_path.parent.as_posix())
+    if minify:
+        fragments = [optimize_html("".join(fragments))]
+    changed, size, io_seconds = write_if_changed(page['path'], fragments)
+    variants_changed = []
+    for variant in ctx.variants:
+        path = variant.site.root / rel_path
+        os.makedirs(path.parent, exist_ok=True)
+        fragments = fill_slots(body, variant)
+        if minify:
+            fragments = [optimize_html("".join(fragments))]
+        variant_changed, _, variant_io = write_if_changed(path, fragments)
+        io_seconds += variant_io
+        if variant_changed:
+            variants_changed.append(os.path.relpath(path, BASE_DIR))
+    return {'changed': changed, 'bytes': size,
+            'seconds': time.perf_counter() - t0, 'write_seconds': io_seconds,
+            'fragment_hits': FRAGMENTS.hits - hits, 'fragment_misses': FRAGMENTS.misses - misses,
+            'links': sorted(links), 'variants_changed': variants_changed}
+
+
+# --- Site Variants ---
+class Slot(tuple):
+    """A site-specific fragment left open in a shared page body: (BuildContext method, *args)."""
+
+
+class SlotContext(BuildContext):
+    """Renders page bodies that every site variant shares.
+
+    Headers, footers and CTAs come out as Slot placeholders instead of
+    HTML; fill_slots() then asks each site's own BuildContext for them.
+    """
+
+    def header(self, title, description, root="../"):
+        return Slot(('header', title, description, root))
+
+    def footer(self, related=""):
+        return Slot(('footer', related))
+
+    def index_header(self):
+        return Slot(('index_header',))
+
+    def index_footer(self):
+        return Slot(('index_footer',))
+
+    def cta(self, plan, label=None, sub_text=None):
+        return Slot(('cta', plan, label, sub_text))
+
+
+def fill_slots(body, ctx):
+    """Yield a shared page body with every Slot rendered for ctx's site."""
+    for fragment in body:
+        if isinstance(fragment, Slot):
+            fragment = getattr(ctx, fragment[0])(*fragment[1:])
+        yield fragment
+
+
+def copy_static(site):
+    """Copy the stylesheets under static/ to a variant's root; return the changed paths."""
+    target = site.root / "static"
+    os.makedirs(target, exist_ok=True)
+    changed = []
+    for path in sorted(STATIC_DIR.glob("*.css")):
+        if write_if_changed(target / path.name, [path.read_text(encoding='utf-8')])[0]:
+            changed.append(os.path.relpath(target / path.name, BASE_DIR))
+    return changed
+
+
+# --- Link Graph ---
+# Only plain relative hrefs; quotes inside the value mean it is built by a script
+_HREF = re.compile(r'href="([^"\'\s<>]*)"')
+_EXTERNAL_LINK = re.compile(r"^(?:[a-z][a-z0-9+.-]*:|//|#)", re.I)
+
+
+def collect_links(fragments, links, page_dir):
+    """Pass fragments through, adding each internal link target to ``links``.
+
+    Targets are stored relative to BASE_DIR, so the build can check every
+    link without reading a single HTML file back.
+    """
+    for fragment in fragments:
+        for href in _HREF.findall(fragment):
+            if href and not _EXTERNAL_LINK.match(href):
+                target = href.split('#', 1)[0].split('?', 1)[0]
+                if target:
+                    links.add(posixpath.normpath(posixpath.join(page_dir, target)))
+        yield fragment
+
+
+LINK_REPORT_LIMIT = 10
+
+
+def check_links(entries):
+    """Find broken links and orphan pages from the outlinks stored in the manifest.
+
+    Returns ([(page, target)] for targets that are neither a built page nor a
+    file on disk, [HTML pages no other page links to]). The top page is the
+    root and never an orphan.
+    """
+    built = {entry['path'] for entry in entries.values()}
+    linked = set()
+    on_disk = {}
+    broken = []
+    for entry in entries.values():
+        for target in entry.get('links', ()):
+            if target != entry['path']:
+                linked.add(target)
+            if target in built:
+                continue
+            if target not in on_disk:
+                on_disk[target] = not target.startswith('..') and (BASE_DIR / target).is_file()
+            if not on_disk[target]:
+                broken.append((entry['path'], target))
+    root = (BASE_DIR / "index.html").relative_to(BASE_DIR).as_posix()
+    orphans = sorted(path for path in built - linked if path.endswith('.html') and path != root)
+    return broken, orphans
+
+
+# --- HTML Optimization ---
+# Blocks whose whitespace matters, or that are not HTML, are copied as they are
+_RAW_BLOCK = re.compile(r"<(script|style|pre|textarea)\b.*?</\1>", re.S | re.I)
+_TAG = re.compile(r"<[a-zA-Z][^<>]*>")
+_STYLE_ATTR = re.compile(r'\sstyle="([^"]*)"')
+_CLASS_ATTR = re.compile(r'\sclass="([^"]*)"')
+
+
+def hoisted_class(style):
+    return "s-" + hashlib.sha1(style.encode('utf-8')).hexdigest()[:7]
+
+
+def hoisted_rule(style):
+    # !important keeps the precedence the declarations had as an inline style
+    decls = [d.strip() for d in style.split(';') if d.strip()]
+    body = ";".join(d if d.endswith("!important") else d + "!important" for d in decls)
+    return f".{hoisted_class(style)}{{{body}}}"
+
+
+def optimize_html(html):
+    """Minify a rendered page and move repeated inline styles into classes.
+
+    Every style attribute used more than once on the page becomes a class
+    named after a hash of its text, defined in a <style> block at the end
+    of <head>. Indentation, blank lines and comments are dropped; line
+    breaks are kept so no inline whitespace is lost.
+    """
+    segments = []
+    pos = 0
+    for m in _RAW_BLOCK.finditer(html):
+        segments.append((False, html[pos:m.start()]))
+        segments.append((True, m.group(0)))
+        pos = m.end()
+    segments.append((False, html[pos:]))
+
+    counts = collections.Counter(style for raw, text in segments if not raw
+                                 for style in _STYLE_ATTR.findall(text))
+    repeated = {style for style, n in counts.items() if n > 1}
+
+    def rewrite_tag(m):
+        tag = m.group(0)
+        style = _STYLE_ATTR.search(tag)
+        if not style or style.group(1) not in repeated:
+            return tag
+        name = hoisted_class(style.group(1))
+        tag = tag[:style.start()] + tag[style.end():]
+        cls = _CLASS_ATTR.search(tag)
+        if cls:
+            return f"{tag[:cls.end(1)]} {name}{tag[cls.end(1):]}"
+        end = re.match(r"<[a-zA-Z][\w-]*", tag).end()
+        return f'{tag[:end]} class="{name}"{tag[end:]}'
+
+    out = []
+    for raw, text in segments:
+        if not raw:
+            text = re.sub(r"<!--.*?-->", "", text, flags=re.S)
+            text = _TAG.sub(rewrite_tag, text)
+            text = re.sub(r"[ \t]*\n\s*", "\n", text)
+            text = re.sub(r"[ \t]{2,}", " ", text)
+        out.append(text)
+    html = "".join(out)
+
+    if repeated:
+        rules = "".join(hoisted_rule(style) for style in counts if style in repeated)
+        html = html.replace("</head>", f"<style>{rules}</style>\n</head>", 1)
     return html
 
 
+_FINGERPRINTED_CSS = re.compile(r"style\.[0-9a-f]{10}\.css(?:\.gz|\.br)?")
+
+
+def fingerprint_stylesheet(write=True):
+    """Write a content-hashed copy of static/style.css; return (file name, changed)."""
+    css = (STATIC_DIR / "style.css").read_bytes()
+    name = f"style.{hashlib.sha256(css).hexdigest()[:10]}.css"
+    if not write:
+        return name, False
+    changed, _, _ = write_if_changed(STATIC_DIR / name, [css.decode('utf-8')])
+    return name, changed
+
+
+def prune_stylesheets(keep):
+    """Remove the fingerprinted copies (and their compressed siblings) other than ``keep``.
+
+    Only safe once every page links ``keep``, i.e. after a full build.
+    """
+    for path in STATIC_DIR.glob("style.*.css*"):
+        if _FINGERPRINTED_CSS.fullmatch(path.name) and not path.name.startswith(keep):
+            path.unlink()
+
+
+# The catalogue, build context and warm fragment cache are handed to each
+# worker once, not pickled with every page
+_worker_data = None
+_worker_ctx = None
+
+def _init_worker(data, ctx, fragments):
+    global _worker_data, _worker_ctx, FRAGMENTS
+    _worker_data = data
+    _worker_ctx = ctx
+    FRAGMENTS = fragments
+
+def _write_page_worker(page):
+    return write_page(page, _worker_data, _worker_ctx)
+
+
+def write_pages(pages, data, ctx, jobs=1):
+    """Render and write pages, yielding (page, result) in order once each is on disk."""
+    if jobs <= 1 or len(pages) < 2:
+        for page in pages:
+            yield page, write_page(page, data, ctx)
+        return
+    prewarm_fragments(data, dict.fromkeys(plan_id for page in pages for plan_id in page['deps']),
+                      [ctx.site] + [variant.site for variant in ctx.variants])
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(data, ctx, FRAGMENTS)) as pool:
+        chunksize = max(1, len(pages) // (jobs * 4))
+        yield from zip(pages, pool.map(_write_page_worker, pages, chunksize=chunksize))
+
+
+# --- Sitemap ---
+class SitemapWriter:
+    """Stream sitemap <url> entries to disk while the pages are being built.
+
+    Entries go to temp files of at most ``max_urls`` URLs each. On close a
+    single part becomes sitemap.xml; several parts become sitemap-N.xml with
+    sitemap.xml as their sitemap index. Files are only replaced when their
+    content changed, and those are listed in ``changed``.
+    """
+
+    def __init__(self, site_url=SITE_URL, path=SITEMAP_FILE, max_urls=SITEMAP_MAX_URLS):
+        self.site_url = site_url.rstrip('/') + '/'
+        self.path = path
+        self.max_urls = max_urls
+        self.parts = []     # [tmp path, sha256, bytes, url count, latest lastmod]
+        self.changed = []
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._discard()
+
+    def _write(self, text):
+        chunk = text.encode('utf-8')
+        part = self.parts[-1]
+        part[1].update(chunk)
+        part[2] += len(chunk)
+        self._file.write(chunk)
+
+    def _finish_part(self):
+        self._write("</urlset>\n")
+        self._file.close()
+        self._file = None
+
+    def add(self, rel_path, lastmod):
+        if self._file is not None and self.parts[-1][3] == self.max_urls:
+            self._finish_part()
+        if self._file is None:
+            tmp = self.path.with_name(f".{self.path.stem}-{len(self.parts) + 1}.{os.getpid()}.tmp")
+            self._file = open(tmp, 'wb')
+            self.parts.append([tmp, hashlib.sha256(), 0, 0, lastmod])
+            self._write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        self._write(f"<url><loc>{xml_escape(self.site_url + rel_path)}</loc>"
+                    f"<lastmod>{lastmod}</lastmod></url>\n")
+        part = self.parts[-1]
+        part[3] += 1
+        part[4] = max(part[4], lastmod)
+
+    def _commit(self, tmp, path, size, digest):
+        if replace_if_changed(tmp, path, size, digest):
+            self.changed.append(path.relative_to(BASE_DIR).as_posix())
+
+    def close(self):
+        if self._file is not None:
+            self._finish_part()
+        if len(self.parts) <= 1:
+            if not self.parts:
+                return
+            tmp, h, size, _, _ = self.parts[0]
+            self._commit(tmp, self.path, size, h.digest())
+            stale = 1
+        else:
+            index = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+                     '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+            for n, (tmp, h, size, _, lastmod) in enumerate(self.parts, 1):
+                part_path = self.path.with_name(f"{self.path.stem}-{n}.xml")
+                self._commit(tmp, part_path, size, h.digest())
+                index.append(f"<sitemap><loc>{xml_escape(self.site_url + part_path.name)}</loc>"
+                             f"<lastmod>{lastmod}</lastmod></sitemap>\n")
+            index.append("</sitemapindex>\n")
+            if write_if_changed(self.path, index)[0]:
+                self.changed.append(self.path.relative_to(BASE_DIR).as_posix())
+            stale = len(self.parts) + 1
+        # Drop parts left over from an earlier, larger build
+        while (old := self.path.with_name(f"{self.path.stem}-{stale}.xml")).exists():
+            os.unlink(old)
+            self.changed.append(old.relative_to(BASE_DIR).as_posix())
+            stale += 1
+
+    def _discard(self):
+        if self._file is not None:
+            self._file.close()
+        for tmp, *_ in self.parts:
+            if tmp.exists():
+                os.unlink(tmp)
+
+
+# --- Precompression ---
+# Siblings written next to every served file, at maximum compression.
+# gzip gets a fixed mtime so identical input gives identical bytes.
+COMPRESSORS = {'.gz': functools.partial(gzip.compress, compresslevel=9, mtime=0)}
+if brotli is not None:
+    COMPRESSORS['.br'] = functools.partial(brotli.compress, mode=brotli.MODE_TEXT, quality=11)
+
+
+def compress_file(path):
+    """Write the compressed siblings of one file unless they are up to date.
+
+    A sibling is up to date when its mtime equals the source's; it is set
+    that way after compressing, and write_if_changed leaves identical
+    sources untouched. Returns (source bytes, {suffix: bytes}, rewritten
+    siblings), or None if the source does not exist.
+    """
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    raw = None
+    sizes = {}
+    rewritten = []
+    for suffix, compress in COMPRESSORS.items():
+        target = path.with_name(path.name + suffix)
+        try:
+            current = target.stat()
+        except FileNotFoundError:
+            current = None
+        if current is not None and current.st_mtime_ns == st.st_mtime_ns:
+            sizes[suffix] = current.st_size
+            continue
+        if raw is None:
+            raw = path.read_bytes()
+        blob = compress(raw)
+        tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        with open(tmp, 'wb') as f:
+            f.write(blob)
+        os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(tmp, target)
+        sizes[suffix] = len(blob)
+        rewritten.append(target)
+    return st.st_size, sizes, rewritten
+
+
+def compressed_current(path):
+    """Whether every compressed sibling of ``path`` is up to date (or there is no source)."""
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return True
+    for suffix in COMPRESSORS:
+        try:
+            if path.with_name(path.name + suffix).stat().st_mtime_ns != mtime:
+                return False
+        except FileNotFoundError:
+            return False
+    return True
+
+
+def compress_files(paths, jobs=1):
+    """Compress files, yielding (path, result) in order.
+
+    Up-to-date files are answered here from stat() alone; only stale ones
+    go to a worker pool, which is not started when there are fewer than two.
+    """
+    stale = [path for path in paths if not compressed_current(path)]
+    if jobs <= 1 or len(stale) < 2:
+        for path in paths:
+            yield path, compress_file(path)
+        return
+    with ProcessPoolExecutor(max_workers=min(jobs, len(stale))) as pool:
+        chunksize = max(1, len(stale) // (jobs * 4))
+        done = dict(zip(stale, pool.map(compress_file, stale, chunksize=chunksize)))
+    for path in paths:
+        yield path, done[path] if path in done else compress_file(path)
+
+
+# --- Odds Calculator PWA ---
+ODDS_DIR = BASE_DIR / "odds-calculator"
+# Linked from index.html as name?v=<content hash>, so a cached copy never goes stale
+ODDS_HASHED_ASSETS = ("style.css", "app.js")
+
+SERVICE_WORKER_TEMPLATE = """// Generated by generate.py from the files in odds-calculator/. Do not edit by hand.
+const CACHE_PREFIX = 'odds-calc-';
+const CACHE_NAME = '__CACHE_NAME__';
+const PRECACHE = __PRECACHE__;
+// URLs carrying a content hash: served from the cache and never revalidated
+const HASHED = new Set(PRECACHE
+    .filter((url) => url.includes('?v='))
+    .map((url) => new URL(url, self.location).href));
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(
+        caches.open(CACHE_NAME)
+            .then((cache) => cache.addAll(PRECACHE))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil(
+        caches.keys()
+            .then((names) => Promise.all(names
+                .filter((name) => name.startsWith(CACHE_PREFIX) && name !== CACHE_NAME)
+                .map((name) => caches.delete(name))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== self.location.origin) {
+        return;
+    }
+    if (HASHED.has(url.href)) {
+        event.respondWith(
+            caches.match(request).then((response) => response || fetch(request))
+        );
+        return;
+    }
+    // Stale-while-revalidate: answer from the cache, refresh it in the background
+    event.respondWith(
+        caches.open(CACHE_NAME).then((cache) => cache.match(request).then((cached) => {
+            const network = fetch(request).then((response) => {
+                if (response.ok) {
+                    cache.put(request, response.clone());
+                }
+                return response;
+            });
+            if (cached) {
+                event.waitUntil(network.catch(() => undefined));
+                return cached;
+            }
+            return network;
+        }))
+    );
+});
+"""
+
+
+def build_odds_calculator(app_dir=ODDS_DIR):
+    """Version the calculator's assets and regenerate its precache manifest and service worker.
+
+    index.html gets ?v=<content hash> on its stylesheet and script, and the
+    cache name is derived from the hash of every precached file, so any
+    change installs a new service worker. Returns the cache name and the
+    files (relative to BASE_DIR) whose content changed; (None, []) for a
+    tree without the calculator.
+    """
+    if not (app_dir / "index.html").is_file():
+        return None, []
+    changed = []
+
+    def write(path, text):
+        if write_if_changed(path, [text])[0]:
+            changed.append(path.relative_to(BASE_DIR).as_posix())
+
+    versions = {name: hashlib.sha256((app_dir / name).read_bytes()).hexdigest()[:10]
+                for name in ODDS_HASHED_ASSETS}
+    pattern = re.compile(r'((?:href|src)=")(%s)(?:\?v=[^"]*)?"' % "|".join(map(re.escape, versions)))
+    index = (app_dir / "index.html").read_bytes().decode('utf-8')
+    write(app_dir / "index.html",
+          pattern.sub(lambda m: f'{m.group(1)}{m.group(2)}?v={versions[m.group(2)]}"', index))
+
+    icons = sorted(path.relative_to(app_dir).as_posix() for path in (app_dir / "icons").glob("*.png"))
+    assets = []
+    for name in ("index.html", *ODDS_HASHED_ASSETS, "manifest.json", *icons):
+        digest = hashlib.sha256((app_dir / name).read_bytes()).hexdigest()
+        url = f"./{name}?v={versions[name]}" if name in versions else f"./{name}"
+        assets.append({'url': url, 'sha256': digest})
+    # The directory URL serves index.html
+    assets.insert(0, {'url': "./", 'sha256': assets[0]['sha256']})
+    version = hashlib.sha256("".join(a['url'] + a['sha256'] for a in assets).encode('utf-8')).hexdigest()[:10]
+    cache_name = f"odds-calc-{version}"
+
+    write(app_dir / "precache-manifest.json",
+          json.dumps({'cache': cache_name, 'assets': assets}, ensure_ascii=False, indent=1) + "\n")
+    precache = json.dumps([a['url'] for a in assets], indent=4)
+    write(app_dir / "sw.js", SERVICE_WORKER_TEMPLATE
+          .replace("__CACHE_NAME__", cache_name).replace("__PRECACHE__", precache))
+    return cache_name, changed
+
+
+# --- Build Statistics ---
+STAGE_OF_KIND = {
+    'review': 'reviews',
+    'compare': 'comparisons',
+    'list': 'listings',
+    'ranking': 'rankings',
+    'feature': 'listings',
+    'best': 'listings',
+    'feed': 'listings',
+    'guide': 'guide',
+    'table': 'table',
+    'data': 'table',
+    'index': 'index',
+}
+
+
+class BuildStats:
+    """Time and bytes per build stage, plus the time of every rendered page.
+
+    Page times come from the process that rendered them, so with --jobs the
+    stage totals add up worker time rather than wall time.
+    """
+
+    ORDER = ('load_data', 'enumerate', 'manifest', 'reviews', 'comparisons', 'rankings',
+             'listings', 'guide', 'table', 'index', 'writes', 'compress', 'links')
+
+    def __init__(self):
+        self.stages = {name: {'pages': 0, 'seconds': 0.0, 'bytes': 0} for name in self.ORDER}
+        self.pages = []
+        self.compressed = {}
+        self.fragments = {'hits': 0, 'misses': 0}
+        self.started = time.perf_counter()
+
+    def add(self, stage, seconds, nbytes=0, pages=0):
+        s = self.stages.setdefault(stage, {'pages': 0, 'seconds': 0.0, 'bytes': 0})
+        s['pages'] += pages
+        s['seconds'] += seconds
+        s['bytes'] += nbytes
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        yield
+        self.add(name, time.perf_counter() - t0)
+
+    def add_page(self, page, result):
+        self.add(STAGE_OF_KIND[page['kind']], result['seconds'] - result['write_seconds'],
+                 result['bytes'], 1)
+        self.add('writes', result['write_seconds'], result['bytes'] if result['changed'] else 0,
+                 1 if result['changed'] else 0)
+        self.pages.append((result['seconds'], page['key'], result['bytes']))
+        self.fragments['hits'] += result['fragment_hits']
+        self.fragments['misses'] += result['fragment_misses']
+
+    def add_compressed(self, kind, raw, sizes):
+        c = self.compressed.setdefault(kind, {'files': 0, 'bytes': 0})
+        c['files'] += 1
+        c['bytes'] += raw
+        for suffix, size in sizes.items():
+            c[suffix] = c.get(suffix, 0) + size
+
+    def slowest(self, n):
+        return heapq.nlargest(n, self.pages)
+
+    def as_dict(self, slowest=10):
+        return {
+            'wall_seconds': round(time.perf_counter() - self.started, 4),
+            'stages': {name: dict(s, seconds=round(s['seconds'], 4)) for name, s in self.stages.items()},
+            'slowest_pages': [{'page': key, 'seconds': round(sec, 5), 'bytes': size}
+                              for sec, key, size in self.slowest(slowest)],
+            'compressed': self.compressed,
+            'fragment_cache': self.fragments,
+        }
+
+    def print_report(self, slowest=10):
+        print("\n📊 ステージ別の処理時間")
+        for name, s in self.stages.items():
+            print(f"  {name:<12} {s['seconds']:9.3f}s {s['pages']:>8,}ページ {s['bytes'] / 1024:>10,.1f} KB")
+        print(f"  {'合計(実時間)':<10} {time.perf_counter() - self.started:9.3f}s")
+        if self.pages:
+            print(f"\n🐢 時間のかかったページ上位{slowest}件")
+            for sec, key, size in self.slowest(slowest):
+                print(f"  {sec * 1000:8.2f}ms {size / 1024:8.1f} KB  {key}")
+        lookups = self.fragments['hits'] + self.fragments['misses']
+        if lookups:
+            print(f"\n🧩 フラグメントキャッシュ: ヒット {self.fragments['hits']:,} / ミス {self.fragments['misses']:,}"
+                  f"（ヒット率 {self.fragments['hits'] / lookups:.1%}）")
+        if self.compressed:
+            print("\n🗜️ 種類別の圧縮後サイズ")
+            for kind, c in self.compressed.items():
+                sizes = "".join(f" {suffix} {c.get(suffix, 0) / 1024:>10,.1f} KB" for suffix in COMPRESSORS)
+                print(f"  {kind:<12} {c['files']:>8,}件 元 {c['bytes'] / 1024:>10,.1f} KB{sizes}")
+
+
+def print_progress(done, total):
+    """Overwrite one terminal line with a page counter (silent when piped)."""
+    if sys.stdout.isatty() and (done == total or done % max(1, total // 100) == 0):
+        end = "\n" if done == total else ""
+        print(f"\r  ⏳ {done:,}/{total:,}ページ", end=end, flush=True)
+
+
+def profile_generator(kind, pages, data, ctx, limit=25):
+    """Render every page of one kind under cProfile and dump the stats."""
+    targets = [page for page in pages if page['kind'] == kind]
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for page in targets:
+        render_page(page, data, ctx)
+    profiler.disable()
+
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    dump = BUILD_DIR / f"profile_{kind}.prof"
+    profiler.dump_stats(dump)
+    print(f"\n🔬 {kind} ×{len(targets)}ページのプロファイル → {dump}")
+    pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(limit)
+
+
+# --- Incremental Build Manifest ---
+def page_inputs(page, data):
+    """Collect everything a page reads from the catalogue."""
+    kind = page['kind']
+    if kind == 'review':
+        return [[get_plan(data, plan_id) for plan_id in page['deps']], data.price_history.get(page['id'])]
+    if kind == 'compare':
+        return [get_plan(data, plan_id) for plan_id in page['deps']]
+    if kind == 'list':
+        return [page['items'], page['page_count']]
+    if kind == 'ranking':
+        ranking = get_ranking(data, page['id'])
+        return [ranking, [get_plan(data, plan_id) for plan_id in ranking['ranking_order']]]
+    if kind == 'guide':
+        return []
+    if kind == 'feature':
+        return [[plan['id'] for plan in data.by_flag[page['id']]], data.by_flag[page['id']]]
+    if kind == 'table':
+        first = (page['page_no'] - 1) * TABLE_PAGE_SIZE
+        page_plans = data['sim_plans'][first:first + TABLE_PAGE_SIZE]
+        return [page['page_count'], len(data['sim_plans']), page_plans, bool(data.price_changes),
+                [data.price_history.get(plan['id']) for plan in page_plans]]
+    if kind == 'feed':
+        return data.price_changes
+    if kind == 'index':
+        return [page['sections'], bool(data.price_changes), data]
+    # The plan data file and the usage pages read the whole catalogue
+    return data
+
+
+def page_hash(page, data, ctx):
+    """Hash of a page's inputs, the template version and the build options."""
+    payload = json.dumps(
+        [TEMPLATE_VERSION, ctx.date.isoformat(), ctx.stylesheet, ctx.minify, page['key'],
+         [site_ctx.site.key() for site_ctx in [ctx, *ctx.variants]], page_inputs(page, data)],
+        ensure_ascii=False, sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'pages': {}}
+
+
+def save_manifest(manifest):
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    tmp = MANIFEST_FILE.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, MANIFEST_FILE)
+
+
 # --- Main ---
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="格安SIM・ネット回線 自動記事生成エンジン")
+    parser.add_argument('--force', action='store_true',
+                        help="ignore the build manifest and rebuild every page")
+    parser.add_argument('--changed-list', type=Path, default=CHANGED_FILES, metavar="PATH",
+                        help="where to write the list of files whose content changed "
+                             f"(default: {CHANGED_FILES.relative_to(BASE_DIR)})")
+    parser.add_argument('--jobs', '-j', type=int, metavar="N",
+                        help="render pages and compress files in N worker processes (0 = one per "
+                             "CPU core; default: pages in this process, compression on every core)")
+    parser.add_argument('--all-pairs', nargs='?', const='all', choices=sorted(PAIR_FILTERS),
+                        metavar="FILTER",
+                        help="also build a comparison page for every plan pair "
+                             "(all, price-band or parent) into sharded directories")
+    parser.add_argument('--minify', action='store_true',
+                        help="minify the HTML, move repeated inline styles into classes and "
+                             "link a content-hashed copy of static/style.css")
+    parser.add_argument('--no-history', action='store_true',
+                        help="do not record prices in or read trends from "
+                             f"{PRICE_HISTORY_FILE.relative_to(BASE_DIR)}")
+    parser.add_argument('--strict-links', action='store_true',
+                        help="exit with an error status when any internal link is broken")
+    parser.add_argument('--no-compress', action='store_true',
+                        help="do not write precompressed .gz/.br siblings of the served files")
+    parser.add_argument('--sites', type=Path, metavar="JSON",
+                        help="also build every site variant listed in this file (own branding, "
+                             "affiliate links and output root) from the same page bodies")
+    parser.add_argument('--site-url', default=SITE_URL, metavar="URL",
+                        help=f"public address of the site used in sitemap.xml (default: {SITE_URL})")
+    parser.add_argument('--stats', action='store_true',
+                        help=f"report time and bytes per stage and the slowest pages "
+                             f"(also saved to {STATS_FILE.relative_to(BASE_DIR)})")
+    parser.add_argument('--slowest', type=int, default=10, metavar="N",
+                        help="number of slowest pages listed by --stats (default: 10)")
+    parser.add_argument('--profile', choices=sorted(STAGE_OF_KIND), metavar="KIND",
+                        help="dump cProfile stats for rendering every page of one kind")
+    parser.add_argument('--verbose', '-v', action='store_true',
+                        help="print a line for every changed page instead of a progress counter")
+    targeted = parser.add_mutually_exclusive_group()
+    targeted.add_argument('--changed', metavar="IDS",
+                          help="comma-separated plan ids; rebuild only the pages that read them")
+    targeted.add_argument('--diff', metavar="OLD_JSON", type=Path,
+                          help="rebuild only the pages affected by changes since this data snapshot")
+    targeted.add_argument('--only', metavar="KIND:GLOB,...",
+                          help="build only these pages, e.g. 'review:*,compare:ahamo_*' "
+                               f"(kinds: {', '.join(PAGE_KINDS)}); the sitemap is left as it is")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="list the pages that would be built and write nothing")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
     print("🚀 記事生成を開始します...")
-    
-    data = load_data()
-    plans = data['sim_plans']
-
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    try:
+        selection = parse_page_selection(args.only) if args.only is not None else None
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    stats = BuildStats()
+    try:
+        with stats.stage('load_data'):
+            data = load_data()
+            old_data = load_data(args.diff) if args.diff is not None else None
+    except CatalogueError as e:
+        # Nothing has been written yet, so a bad record cannot leave a half-built site
+        print("❌ データファイルに問題があります。出力は行いません:")
+        for problem in e.problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+    try:
+        sites = load_sites(args.sites) if args.sites is not None else []
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"❌ サイト設定を読み込めません（{e}）。出力は行いません。")
+        sys.exit(1)
+    build_date = datetime.date.today()
+    if args.dry_run:
+        # A dry run writes nothing, not even today's prices
+        if not args.no_history and PRICE_HISTORY_FILE.exists():
+            with PriceHistory() as history:
+                attach_price_history(data, history)
+    elif not args.no_history:
+        with PriceHistory() as history:
+            price_changes = history.record(data, build_date)
+            attach_price_history(data, history)
+        for plan_id, old, new in price_changes:
+            print(f"  💹 料金変更: {get_plan(data, plan_id)['carrier']} {old:,}円 → {new:,}円")
+
+    changed_files = []
+    stylesheet = "style.css"
+    if args.minify:
+        stylesheet, css_changed = fingerprint_stylesheet(write=not args.dry_run)
+        if css_changed:
+            changed_files.append((STATIC_DIR / stylesheet).relative_to(BASE_DIR).as_posix())
+    ctx = BuildContext(build_date, stylesheet=stylesheet, minify=args.minify, variants=sites)
+
+    manifest = load_manifest()
+    previous = manifest.get('pages', {})
+    with stats.stage('enumerate'):
+        if selection is not None:
+            pages = list(select_pages(data, selection, args.all_pairs))
+        else:
+            pages = enumerate_pages(data, args.all_pairs)
+    all_pages = pages
+    force = args.force
 
-    count = 0
+    if args.changed is not None or args.diff is not None:
+        if args.diff is not None:
+            changed_plans, changed_rankings = diff_catalogues(old_data, data)
+        else:
+            changed_plans = {pid.strip() for pid in args.changed.split(',') if pid.strip()}
+            changed_rankings = set()
+            unknown = changed_plans - data.by_id.keys()
+            if unknown:
+                print(f"  ⚠️ 不明なプランID: {', '.join(sorted(unknown))}")
+        targets = affected_pages(pages, changed_plans, changed_rankings)
+        print(f"  🎯 変更対象: {len(targets)}/{len(pages)}ページ")
+        # Untouched pages keep their manifest entries from the previous build
+        entries = {page['key']: previous[page['key']] for page in pages
+                   if page['key'] in previous}
+        pages = targets
+        force = True
+    elif selection is not None:
+        print(f"  🎯 選択されたページ: {len(pages)}件")
+        # Pages outside the selection keep their manifest entries as they are
+        entries = dict(previous)
+    else:
+        entries = {}
+    todo = []
+    skipped = 0
+    t0 = time.perf_counter()
+    for page in pages:
+        digest = page_hash(page, data, ctx)
+        rel_path = page['path'].relative_to(BASE_DIR).as_posix()
+        entry = previous.get(page['key'])
+        if (not force and entry and entry['hash'] == digest
+                and entry['path'] == rel_path and page['path'].exists()
+                and all((site.root / rel_path).exists() for site in sites)):
+            entries[page['key']] = entry
+            skipped += 1
+            continue
+        todo.append(page)
+        entries[page['key']] = {'path': rel_path, 'hash': digest, 'built': ctx.date.isoformat()}
+    stats.add('manifest', time.perf_counter() - t0)
 
-    # 1. Reviews
-    for plan in plans:
-        html = generate_review(plan, data)
-        path = OUTPUT_DIR / f"review_{plan['id']}.html"
-        with open(path, 'w', encoding='utf-8') as f:
-            f.write(html)
-        print(f"  ✅ レビュー: {plan['carrier']} → {path.name}")
-        count += 1
+    if args.dry_run:
+        for page in todo:
+            print(f"  - {page['key']} → {page['path'].relative_to(BASE_DIR).as_posix()}")
+        print(f"\n🔍 ドライラン: {len(todo)}件を生成します（変更なし {skipped}件はスキップ）。ファイルは書き込みません。")
+        return
 
-    # 2. Comparisons
-    for pair in data.get('compare_pairs', []):
-        plan_a = get_plan(data, pair[0])
-        plan_b = get_plan(data, pair[1])
-        if plan_a and plan_b:
-            html = generate_comparison(plan_a, plan_b, data)
-            path = OUTPUT_DIR / f"compare_{pair[0]}_vs_{pair[1]}.html"
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(html)
-            print(f"  ✅ 比較: {plan_a['carrier']} vs {plan_b['carrier']} → {path.name}")
-            count += 1
-
-    # 3. Rankings
-    for ranking in data.get('ranking_articles', []):
-        html = generate_ranking(ranking, data)
-        path = OUTPUT_DIR / f"ranking_{ranking['id']}.html"
-        with open(path, 'w', encoding='utf-8') as f:
-            f.write(html)
-        print(f"  ✅ ランキング: {ranking['title']} → {path.name}")
-        count += 1
-
-    # 4. Guide article
-    guide_html = generate_guide(data)
-    guide_path = OUTPUT_DIR / "guide_kakuyasu.html"
-    with open(guide_path, 'w', encoding='utf-8') as f:
-        f.write(guide_html)
-    print(f"  ✅ ガイド: 格安SIMとは？ → guide_kakuyasu.html")
-    count += 1
-
-    # 5. Comparison table
-    table_html = generate_comparison_table(data)
-    table_path = OUTPUT_DIR / "hikaku_table.html"
-    with open(table_path, 'w', encoding='utf-8') as f:
-        f.write(table_html)
-    print(f"  ✅ 比較表: 全プラン比較表 → hikaku_table.html")
-    count += 1
-
-    # 6. Index
-    index_html = generate_index(data)
-    index_path = BASE_DIR / "index.html"
-    with open(index_path, 'w', encoding='utf-8') as f:
-        f.write(index_html)
-    print(f"  ✅ トップページ → index.html")
-    count += 1
-
-    print(f"\n🎉 完了！ {count}件の記事を生成しました。")
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    for site in sites:
+        changed_files.extend(copy_static(site))
+    for directory in {page['path'].parent for page in todo}:
+        os.makedirs(directory, exist_ok=True)
+
+    # Pages render serially unless --jobs is given; compression uses every core by default
+    cores = os.cpu_count() or 1
+    jobs = 1 if args.jobs is None else args.jobs if args.jobs > 0 else cores
+    compress_jobs = jobs if args.jobs else cores
+    built = 0
+    results = write_pages(todo, data, ctx, jobs)
+    todo_keys = {page['key'] for page in todo}
+    # Walk every page in build order so the sitemap is written as pages
+    # finish, with skipped pages keeping the lastmod of their last build.
+    # A selective build leaves the sitemap of the last full build alone.
+    with (SitemapWriter(args.site_url) if selection is None else contextlib.nullcontext()) as sitemap:
+        for page in all_pages:
+            if page['key'] in todo_keys:
+                page, result = next(results)
+                built += 1
+                stats.add_page(page, result)
+                entries[page['key']]['links'] = result['links']
+                if result['changed']:
+                    changed_files.append(page['path'].relative_to(BASE_DIR).as_posix())
+                    if args.verbose:
+                        print(f"  ✅ {page['label']} → {page['path'].name}")
+                changed_files.extend(result['variants_changed'])
+                if not args.verbose:
+                    print_progress(built, len(todo))
+            entry = entries.get(page['key'])
+            if sitemap is not None and entry and page['path'].suffix == '.html':
+                sitemap.add(entry['path'], entry['built'])
+    if sitemap is not None:
+        changed_files.extend(sitemap.changed)
+    if args.minify and selection is None and args.changed is None and args.diff is None:
+        # A full build has just rewritten every page that linked an older copy
+        prune_stylesheets(ctx.stylesheet)
+
+    # The pages are on disk; record them before any of the optional steps below
+    with stats.stage('manifest'):
+        manifest['pages'] = entries
+        save_manifest(manifest)
+
+    cache_name, odds_changed = build_odds_calculator()
+    if odds_changed:
+        print(f"  📱 オッズ計算機のキャッシュを更新: {cache_name}")
+    changed_files.extend(odds_changed)
+
+    if not args.no_compress:
+        with stats.stage('compress'):
+            sources = [(page['kind'], page['path']) for page in all_pages if page['key'] in entries]
+            sources.append(('static', STATIC_DIR / "style.css"))
+            if ctx.stylesheet != "style.css":
+                sources.append(('static', STATIC_DIR / ctx.stylesheet))
+            sources.extend(('sitemap', path) for path in sorted(BASE_DIR.glob(f"{SITEMAP_FILE.stem}*.xml")))
+            recompressed = 0
+            results = compress_files([path for _, path in sources], compress_jobs)
+            for (kind, _), (path, result) in zip(sources, results):
+                if result is None:
+                    continue
+                raw, sizes, rewritten = result
+                stats.add_compressed(kind, raw, sizes)
+                recompressed += bool(rewritten)
+                changed_files.extend(target.relative_to(BASE_DIR).as_posix() for target in rewritten)
+
+    with stats.stage('links'):
+        broken, orphans = check_links(entries)
+
+    # The deploy step only needs to push the files listed here
+    os.makedirs(args.changed_list.parent, exist_ok=True)
+    with open(args.changed_list, 'w', encoding='utf-8') as f:
+        f.writelines(f"{path}\n" for path in changed_files)
+
+    print(f"\n🎉 完了！ {built}件の記事を生成しました（変更なし {skipped}件はスキップ）。")
+    if not args.no_compress:
+        print(f"🗜️ 圧縮ファイルを更新: {recompressed}件（{' '.join(COMPRESSORS)}）")
+    print(f"📝 内容が変わったファイル: {len(changed_files)}件 → {args.changed_list}")
     print(f"📂 出力先: {OUTPUT_DIR}")
+    for site in sites:
+        print(f"📂 {site.name}（{site.id}）: {site.root}")
     print(f"🌐 index.html をブラウザで開いてください。")
 
+    if broken:
+        print(f"\n🔗 リンク切れ: {len(broken)}件")
+        for source, target in broken[:LINK_REPORT_LIMIT]:
+            print(f"  - {source} → {target}")
+    if orphans:
+        print(f"\n🏝️ どこからもリンクされていないページ: {len(orphans)}件")
+        for path in orphans[:LINK_REPORT_LIMIT]:
+            print(f"  - {path}")
+
+    if args.stats:
+        stats.print_report(args.slowest)
+        with open(STATS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(stats.as_dict(args.slowest), f, ensure_ascii=False, indent=1)
+    if args.profile:
+        profile_generator(args.profile, all_pages, data, ctx)
+    if broken and args.strict_links:
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
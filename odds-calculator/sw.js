@@ -1,24 +1,64 @@
-const CACHE_NAME = 'odds-calc-v2';
-const ASSETS = [
-    './',
-    './index.html',
-    './style.css',
-    './app.js',
-    './manifest.json',
-    './icons/icon-192.png',
-    './icons/icon-512.png'
+// Generated by generate.py from the files in odds-calculator/. Do not edit by hand.
+const CACHE_PREFIX = 'odds-calc-';
+const CACHE_NAME = 'odds-calc-788a0165cb';
+const PRECACHE = [
+    "./",
+    "./index.html",
+    "./style.css?v=ec53c0c6a1",
+    "./app.js?v=d9ba5b86aa",
+    "./manifest.json",
+    "./icons/icon-192.png",
+    "./icons/icon-512.png"
 ];
+// URLs carrying a content hash: served from the cache and never revalidated
+const HASHED = new Set(PRECACHE
+    .filter((url) => url.includes('?v='))
+    .map((url) => new URL(url, self.location).href));
 
 self.addEventListener('install', (event) => {
     event.waitUntil(
         caches.open(CACHE_NAME)
-            .then((cache) => cache.addAll(ASSETS))
+            .then((cache) => cache.addAll(PRECACHE))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil(
+        caches.keys()
+            .then((names) => Promise.all(names
+                .filter((name) => name.startsWith(CACHE_PREFIX) && name !== CACHE_NAME)
+                .map((name) => caches.delete(name))))
+            .then(() => self.clients.claim())
     );
 });
 
 self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== self.location.origin) {
+        return;
+    }
+    if (HASHED.has(url.href)) {
+        event.respondWith(
+            caches.match(request).then((response) => response || fetch(request))
+        );
+        return;
+    }
+    // Stale-while-revalidate: answer from the cache, refresh it in the background
     event.respondWith(
-        caches.match(event.request)
-            .then((response) => response || fetch(event.request))
+        caches.open(CACHE_NAME).then((cache) => cache.match(request).then((cached) => {
+            const network = fetch(request).then((response) => {
+                if (response.ok) {
+                    cache.put(request, response.clone());
+                }
+                return response;
+            });
+            if (cached) {
+                event.waitUntil(network.catch(() => undefined));
+                return cached;
+            }
+            return network;
+        }))
     );
 });
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+記事プレビューサーバー
+Usage: python serve.py [--host 127.0.0.1] [--port 8000] [--all-pairs [FILTER]]
+                       [--cache-size N] [--interval SECONDS]
+
+Renders any page of the site on request through the generate.py page
+generators and keeps the results in an LRU cache. data/plans_data.json is
+polled for changes; on a change only the cached pages that read a changed
+plan or ranking are dropped. Of the files that are not generated pages,
+only those of the published site (static/, odds-calculator/, output/,
+index.html and the sitemaps) are served from disk.
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import datetime
+import mimetypes
+import os
+import re
+import time
+import urllib.parse
+from pathlib import Path
+
+import generate
+
+BASE_DIR = generate.BASE_DIR
+
+# What may be served from disk: these directories, and these files at the top
+SERVED_DIRS = ("static", "odds-calculator", "output")
+SERVED_FILES = re.compile(r"index\.html|sitemap(?:-\d+)?\.xml")
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+# --- Page Cache ---
+class PageCache:
+    """LRU cache of rendered pages: URL path -> (page, body bytes)."""
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, url):
+        entry = self._items.get(url)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._items.move_to_end(url)
+        return entry[1]
+
+    def put(self, url, page, body):
+        self._items[url] = (page, body)
+        self._items.move_to_end(url)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+    def invalidate(self, is_stale):
+        """Drop every entry for which is_stale(url, page) is true; return how many."""
+        stale = [url for url, (page, _) in self._items.items() if is_stale(url, page)]
+        for url in stale:
+            del self._items[url]
+        return len(stale)
+
+
+# --- Site ---
+class Site:
+    """The loaded catalogue, its pages by URL path and the rendered-page cache."""
+
+    def __init__(self, data_file=generate.DATA_FILE, pair_filter=None, cache_size=512):
+        self.data_file = Path(data_file)
+        self.pair_filter = pair_filter
+        self.cache = PageCache(cache_size)
+        self.signature = self._signature()
+        self.data = self._load()
+        self.ctx = generate.BuildContext()
+        # One thread: the generate.py fragment cache is not thread-safe
+        self.renderer = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._route()
+
+    def _signature(self):
+        st = os.stat(self.data_file)
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self):
+        data = generate.load_data(self.data_file)
+        # Read-only: only generate.py records prices
+        if generate.PRICE_HISTORY_FILE.exists():
+            with generate.PriceHistory() as history:
+                generate.attach_price_history(data, history)
+        return data
+
+    def _route(self):
+        self.pages = generate.enumerate_pages(self.data, self.pair_filter)
+        self.routes = {"/" + page['path'].relative_to(BASE_DIR).as_posix(): page for page in self.pages}
+        self.routes["/"] = self.routes["/index.html"]
+
+    async def render(self, url):
+        """Return (body, cached) for a generated page, or None if ``url`` is not one.
+
+        Cache misses render in the render thread, so other connections are
+        served meanwhile.
+        """
+        page = self.routes.get(url)
+        if page is None:
+            return None
+        if self.ctx.date != datetime.date.today():
+            # Every page carries the date stamp
+            self.ctx = generate.BuildContext()
+            self.cache.clear()
+        body = self.cache.get(url)
+        if body is not None:
+            return body, True
+        data, ctx = self.data, self.ctx
+        body = await asyncio.get_running_loop().run_in_executor(
+            self.renderer, lambda: generate.render_page(page, data, ctx).encode('utf-8'))
+        # A reload or date change while rendering leaves this copy stale
+        if self.data is data and self.ctx is ctx:
+            self.cache.put(url, page, body)
+        return body, False
+
+    def reload(self):
+        """Reload the catalogue if its file changed and drop the affected pages.
+
+        Returns (changed plan ids, dropped cache entries), or None when the
+        file is unchanged or cannot be loaded; the previous catalogue then
+        stays in service.
+        """
+        try:
+            signature = self._signature()
+        except OSError:
+            return None
+        if signature == self.signature:
+            return None
+        self.signature = signature
+        try:
+            data = self._load()
+        except generate.CatalogueError as e:
+            print("❌ データファイルに問題があります。以前のデータで配信を続けます:")
+            for problem in e.problems:
+                print(f"  - {problem}")
+            return None
+        except (OSError, ValueError) as e:
+            print(f"❌ データファイルを読み込めません（{e}）。以前のデータで配信を続けます。")
+            return None
+
+        changed_plans, changed_rankings = generate.diff_catalogues(self.data, data)
+        self.data = data
+        self._route()
+        stale = {page['key'] for page in generate.affected_pages(self.pages, changed_plans, changed_rankings)}
+        # A page whose enumeration changed (listing contents, removed plans) is stale too
+        dropped = self.cache.invalidate(
+            lambda url, page: page['key'] in stale or self.routes.get(url) != page)
+        return changed_plans, dropped
+
+
+async def watch(site, interval):
+    """Poll the catalogue file and invalidate cached pages when it changes."""
+    while True:
+        await asyncio.sleep(interval)
+        result = site.reload()
+        if result is not None:
+            changed, dropped = result
+            names = ", ".join(sorted(changed)) or "なし"
+            print(f"🔄 データ更新: 変更プラン {names} → キャッシュ {dropped}件を破棄")
+
+
+# --- HTTP ---
+def static_file(url):
+    """Resolve a URL path to a published file, refusing everything outside SERVED_DIRS/SERVED_FILES."""
+    parts = [part for part in url.split("/") if part]
+    if any(part.startswith(".") for part in parts):
+        return None
+    if parts and parts[0] in SERVED_DIRS:
+        root = (BASE_DIR / parts[0]).resolve()
+    elif len(parts) <= 1 and SERVED_FILES.fullmatch(parts[0] if parts else "index.html"):
+        root = BASE_DIR.resolve()
+    else:
+        return None
+    path = (BASE_DIR / "/".join(parts)).resolve()
+    if path.is_dir():
+        path = path / "index.html"
+    if not path.is_relative_to(root) or not path.is_file():
+        return None
+    return path
+
+
+def content_type(name):
+    ctype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if ctype.startswith("text/") or ctype in ("application/json", "application/javascript"):
+        ctype += "; charset=utf-8"
+    return ctype
+
+
+def response(status, body, ctype="text/plain; charset=utf-8", extra=()):
+    head = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}",
+            f"Content-Type: {ctype}",
+            f"Content-Length: {len(body)}",
+            "Cache-Control: no-cache",
+            "Connection: close",
+            *extra]
+    return ("\r\n".join(head) + "\r\n\r\n").encode('latin-1')
+
+
+async def handle(reader, writer, site):
+    try:
+        request = await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        writer.close()
+        return
+
+    t0 = time.perf_counter()
+    try:
+        method, target, _ = request.split(b"\r\n", 1)[0].decode('latin-1').split(" ", 2)
+    except ValueError:
+        method, target = None, ""
+    url = urllib.parse.unquote(urllib.parse.urlsplit(target).path)
+    extra = []
+    if method is None or not url.startswith("/"):
+        status, body, ctype = 400, b"bad request\n", "text/plain; charset=utf-8"
+    elif method not in ("GET", "HEAD"):
+        status, body, ctype = 405, b"method not allowed\n", "text/plain; charset=utf-8"
+        extra.append("Allow: GET, HEAD")
+    else:
+        rendered = await site.render(url)
+        if rendered is not None:
+            body, cached = rendered
+            status, ctype = 200, content_type(url if url != "/" else "index.html")
+            extra.append(f"X-Cache: {'HIT' if cached else 'MISS'}")
+        elif (path := static_file(url)) is not None:
+            status, body, ctype = 200, path.read_bytes(), content_type(path.name)
+        else:
+            status, body, ctype = 404, "ページが見つかりません\n".encode('utf-8'), "text/plain; charset=utf-8"
+
+    try:
+        writer.write(response(status, body, ctype, extra))
+        if method != "HEAD":
+            writer.write(body)
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+    print(f"  {status} {method} {url} ({(time.perf_counter() - t0) * 1000:.1f}ms)")
+
+
+async def serve(args):
+    site = Site(args.data, args.all_pairs, args.cache_size)
+    server = await asyncio.start_server(lambda r, w: handle(r, w, site), args.host, args.port)
+    print(f"🌐 http://{args.host}:{args.port}/ でプレビューを配信中（{len(site.routes) - 1:,}ページ、Ctrl+C で終了）")
+    print(f"👀 {args.data} の変更を監視しています")
+    async with server:
+        await asyncio.gather(server.serve_forever(), watch(site, args.interval))
+
+
+# --- Main ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="記事プレビューサーバー")
+    parser.add_argument('--host', default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8000, help="port to listen on (default: 8000)")
+    parser.add_argument('--data', type=Path, default=generate.DATA_FILE, metavar="PATH",
+                        help="catalogue to serve and watch (default: data/plans_data.json)")
+    parser.add_argument('--all-pairs', nargs='?', const='all', choices=sorted(generate.PAIR_FILTERS),
+                        metavar="FILTER", help="also serve the all-pairs comparison pages")
+    parser.add_argument('--cache-size', type=int, default=512, metavar="N",
+                        help="rendered pages kept in memory (default: 512)")
+    parser.add_argument('--interval', type=float, default=1.0, metavar="SECONDS",
+                        help="how often to check the catalogue for changes (default: 1.0)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\n👋 終了しました")
+
+if __name__ == "__main__":
+    main()